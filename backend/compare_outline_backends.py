@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Parity harness for the OutlineExtractor layout backends.
+
+Runs every PDF in a corpus through the pdfminer and PyMuPDF backends,
+reports per-file outline differences and speedups, and optionally writes a
+JSON report.
+
+Usage:
+    python compare_outline_backends.py <pdf_dir_or_file> [...] [--json report.json]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from process_pdfs import get_outline_extractor, PDFMINER_BACKEND, PYMUPDF_BACKEND
+
+
+def _timed_outline(pdf_path: str, backend: str):
+    start = time.perf_counter()
+    # Layout analysis only: the embedded-TOC fast path would bypass both backends
+    result = get_outline_extractor().extract_outline(pdf_path, backend=backend, use_toc=False)
+    return result, time.perf_counter() - start
+
+
+def diff_outlines(reference: dict, candidate: dict) -> dict:
+    """Headings missing from / added by the candidate, and level changes."""
+    ref_items = {(h['text'], h['page']): h['level'] for h in reference.get('outline', [])}
+    cand_items = {(h['text'], h['page']): h['level'] for h in candidate.get('outline', [])}
+
+    missing = [{"text": t, "page": p, "level": ref_items[(t, p)]}
+               for (t, p) in ref_items if (t, p) not in cand_items]
+    added = [{"text": t, "page": p, "level": cand_items[(t, p)]}
+             for (t, p) in cand_items if (t, p) not in ref_items]
+    level_changes = [{"text": t, "page": p, "reference": ref_items[(t, p)], "candidate": cand_items[(t, p)]}
+                     for (t, p) in ref_items
+                     if (t, p) in cand_items and ref_items[(t, p)] != cand_items[(t, p)]]
+    return {
+        "identical": reference == candidate,
+        "title_match": reference.get('title', '') == candidate.get('title', ''),
+        "missing": missing,
+        "added": added,
+        "level_changes": level_changes,
+    }
+
+
+def compare_file(pdf_path: str) -> dict:
+    reference, ref_time = _timed_outline(pdf_path, PDFMINER_BACKEND)
+    candidate, cand_time = _timed_outline(pdf_path, PYMUPDF_BACKEND)
+    return {
+        "file": pdf_path,
+        "pdfminer_seconds": round(ref_time, 4),
+        "pymupdf_seconds": round(cand_time, 4),
+        "speedup": round(ref_time / cand_time, 2) if cand_time > 0 else None,
+        "reference_headings": len(reference.get('outline', [])),
+        "candidate_headings": len(candidate.get('outline', [])),
+        **diff_outlines(reference, candidate),
+    }
+
+
+def collect_pdfs(inputs):
+    pdfs = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            pdfs.extend(sorted(str(p) for p in path.glob("*.pdf")))
+        elif path.suffix.lower() == ".pdf":
+            pdfs.append(str(path))
+    return pdfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pdfminer and PyMuPDF outline backends")
+    parser.add_argument("inputs", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--json", dest="json_path", help="Write the full report to this path")
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.inputs)
+    if not pdfs:
+        sys.exit("No PDF files found")
+
+    reports = []
+    for pdf_path in pdfs:
+        report = compare_file(pdf_path)
+        reports.append(report)
+        status = "identical" if report["identical"] else (
+            f"-{len(report['missing'])} +{len(report['added'])} ~{len(report['level_changes'])}"
+            + ("" if report["title_match"] else " title differs")
+        )
+        print(f"{Path(pdf_path).name}: pdfminer {report['pdfminer_seconds']:.2f}s, "
+              f"pymupdf {report['pymupdf_seconds']:.2f}s (x{report['speedup']}) - {status}")
+
+    total_ref = sum(r["pdfminer_seconds"] for r in reports)
+    total_cand = sum(r["pymupdf_seconds"] for r in reports)
+    summary = {
+        "files": len(reports),
+        "identical": sum(1 for r in reports if r["identical"]),
+        "title_matches": sum(1 for r in reports if r["title_match"]),
+        "pdfminer_seconds": round(total_ref, 4),
+        "pymupdf_seconds": round(total_cand, 4),
+        "overall_speedup": round(total_ref / total_cand, 2) if total_cand > 0 else None,
+    }
+    print(f"\nSummary: {summary['identical']}/{summary['files']} identical outlines, "
+          f"{summary['title_matches']}/{summary['files']} matching titles, "
+          f"overall speedup x{summary['overall_speedup']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "files": reports}, f, indent=2, ensure_ascii=False)
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -110,4 +110,8 @@ def _start_store_cleanup_thread() -> None:
 # Start the cleanup thread immediately
 _start_store_cleanup_thread()
 
+# Drop spool files left behind by uploads interrupted before a restart
+from services.storage_service import cleanup_stale_spool_files
+cleanup_stale_spool_files()
+
 
@@ -12,5 +12,6 @@ class OutlineResponse(BaseModel):
     docId: str
     title: str
     outline: List[OutlineItem]
+    source: str = "layout"  # "embedded_toc" when the PDF's bookmarks were used
 
 
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Parse-once representation of a PDF shared by the outline extractor, the
+semantic index section extractor and the persona analyzer.
+
+A single PyMuPDF pass produces text spans with font metadata and page
+geometry; page text is rebuilt from the spans when needed. The pdfminer layout blocks used by ``OutlineExtractor`` are
+attached lazily the first time an outline is computed for the document.
+PyMuPDF is fast enough that the parse always runs serially; only the much
+slower pdfminer font pass is split into page ranges (``map_page_shards``).
+
+Spans are stored column-wise in a ``SpanTable``: one NumPy structured-array
+row per span and every span's text in a single string buffer, so analyzers
+can filter, group and sort them with array operations instead of building a
+Python object per span.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+
+
+# Bump whenever the parsed representation changes so persisted copies are rebuilt
+PARSED_DOCUMENT_VERSION = 3
+
+# One row per span. Text lives in SpanTable.text: the span's raw text is
+# text[start:end] and text[strip_start:strip_end] is the same text stripped
+# (empty for whitespace-only spans).
+SPAN_DTYPE = np.dtype([
+    ('page', np.int32), ('block', np.int32), ('line', np.int32),
+    ('x0', np.float64), ('y0', np.float64), ('x1', np.float64), ('y1', np.float64),
+    ('size', np.float64), ('flags', np.int32), ('font', np.int32),
+    ('start', np.int64), ('end', np.int64), ('strip_start', np.int64), ('strip_end', np.int64),
+])
+# Columns filled from PyMuPDF span records, in row-tuple order
+_SPAN_INPUT_FIELDS = ('page', 'block', 'line', 'x0', 'y0', 'x1', 'y1', 'size', 'flags', 'font')
+
+# The pdfminer font pass over documents with at least this many pages is split
+# into page ranges processed by separate worker processes, in page order
+PAGE_PARALLEL_MIN_PAGES = int(os.environ.get("PAGE_PARALLEL_MIN_PAGES", "200"))
+PAGE_WORKERS = int(os.environ.get("PAGE_WORKERS", str(max(1, min(4, os.cpu_count() or 1)))))
+
+# Layout block keys produced by OutlineExtractor.analyze_fonts
+_LAYOUT_FIELDS = ('text', 'page', 'size', 'font_name', 'is_bold', 'x', 'y')
+
+
+class SpanTable:
+    """Columnar span storage shared by the outline and persona analyzers.
+
+    rows is a SPAN_DTYPE structured array in extraction order (page, block,
+    line, span); text is the concatenation of every span's text. Tables
+    returned by take() share the text buffer.
+    """
+
+    __slots__ = ('rows', 'text')
+
+    def __init__(self, rows: Optional[np.ndarray] = None, text: str = "") -> None:
+        self.rows = np.zeros(0, dtype=SPAN_DTYPE) if rows is None else rows
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def from_rows(cls, rows: List[tuple]) -> "SpanTable":
+        """Build from (page, block, line, x0, y0, x1, y1, size, flags, font_idx, text) tuples"""
+        table = np.zeros(len(rows), dtype=SPAN_DTYPE)
+        if not rows:
+            return cls(table)
+        columns = list(zip(*rows))
+        for name, values in zip(_SPAN_INPUT_FIELDS, columns):
+            table[name] = values
+        texts = columns[-1]
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        table['end'] = np.cumsum(lengths)
+        table['start'] = table['end'] - lengths
+        stripped_end = np.fromiter((len(t.rstrip()) for t in texts), dtype=np.int64, count=len(texts))
+        leading = lengths - np.fromiter((len(t.lstrip()) for t in texts), dtype=np.int64, count=len(texts))
+        table['strip_start'] = table['start'] + np.where(stripped_end > 0, leading, 0)
+        table['strip_end'] = table['start'] + stripped_end
+        return cls(table, ''.join(texts))
+
+    def take(self, index: np.ndarray) -> "SpanTable":
+        """Rows selected by a boolean mask or index array (text buffer is shared)"""
+        return SpanTable(self.rows[index], self.text)
+
+    def nonblank(self) -> "SpanTable":
+        return self.take(self.rows['strip_end'] > self.rows['strip_start'])
+
+    def texts(self, stripped: bool = False) -> List[str]:
+        start, end = ('strip_start', 'strip_end') if stripped else ('start', 'end')
+        text = self.text
+        return [text[a:b] for a, b in zip(self.rows[start].tolist(), self.rows[end].tolist())]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"columns": {name: self.rows[name].tolist() for name in SPAN_DTYPE.names}, "text": self.text}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SpanTable":
+        columns = data.get("columns") or {}
+        rows = np.zeros(len(columns.get("page", [])), dtype=SPAN_DTYPE)
+        for name in SPAN_DTYPE.names:
+            if name in columns:
+                rows[name] = columns[name]
+        return cls(rows, data.get("text", ""))
+
+
+def round_sizes(sizes: np.ndarray, ndigits: int = 1) -> np.ndarray:
+    """round() applied element-wise, with Python's exact decimal rounding.
+
+    Documents use few distinct sizes, so each unique value is rounded once.
+    """
+    if len(sizes) == 0:
+        return np.zeros(0, dtype=np.float64)
+    unique, inverse = np.unique(sizes, return_inverse=True)
+    return np.array([round(float(v), ndigits) for v in unique], dtype=np.float64)[inverse]
+
+
+def value_counts(values: np.ndarray) -> Dict[float, int]:
+    """{value: count} in first-occurrence order (like counting into a dict)"""
+    if len(values) == 0:
+        return {}
+    unique, first, counts = np.unique(values, return_index=True, return_counts=True)
+    order = np.argsort(first, kind='stable')
+    return dict(zip(unique[order].tolist(), counts[order].tolist()))
+
+
+def most_common_value(values: np.ndarray, default: Any = None) -> Any:
+    """Most frequent value; ties go to the one seen first"""
+    counts = value_counts(values)
+    if not counts:
+        return default
+    return max(counts.items(), key=lambda x: x[1])[0]
+
+
+@dataclass
+class ParsedDocument:
+    doc_id: str
+    page_sizes: List[Tuple[float, float]] = field(default_factory=list)
+    fonts: List[str] = field(default_factory=list)
+    spans: SpanTable = field(default_factory=SpanTable)
+    layout_blocks: Optional[List[Dict[str, Any]]] = None
+    version: int = PARSED_DOCUMENT_VERSION
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_sizes)
+
+    @cached_property
+    def page_texts(self) -> List[str]:
+        """Plain text of each page, rebuilt from the spans instead of being stored.
+
+        Laid out like PyMuPDF's get_text(): a line's spans run together and
+        every line ends in a newline.
+        """
+        pages: List[List[str]] = [[] for _ in self.page_sizes]
+        rows = self.spans.rows
+        lines = zip(rows['page'].tolist(), rows['block'].tolist(), rows['line'].tolist())
+        previous = None
+        for line, text in zip(lines, self.spans.texts()):
+            if line != previous:
+                if previous is not None:
+                    pages[previous[0]].append("\n")
+                previous = line
+            pages[line[0]].append(text)
+        if previous is not None:
+            pages[previous[0]].append("\n")
+        return ["".join(parts) for parts in pages]
+
+    def iter_spans(self) -> Iterator[Tuple[int, str, float, int, str, float, float]]:
+        """Yield (page_index, text, size, flags, font_name, x0, y0) for every span.
+
+        Text is returned unstripped; whitespace-only spans are included.
+        """
+        fonts = self.fonts
+        rows = self.spans.rows
+        columns = zip(rows['page'].tolist(), self.spans.texts(), rows['size'].tolist(),
+                      rows['flags'].tolist(), rows['font'].tolist(), rows['x0'].tolist(), rows['y0'].tolist())
+        for page, text, size, flags, font, x0, y0 in columns:
+            yield page, text, size, flags, fonts[font], x0, y0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact, JSON-serializable form (span columns and row lists, no per-span dicts)."""
+        layout = None
+        if self.layout_blocks is not None:
+            layout = [[b[k] for k in _LAYOUT_FIELDS] for b in self.layout_blocks]
+        return {
+            "version": self.version,
+            "doc_id": self.doc_id,
+            "page_sizes": [list(s) for s in self.page_sizes],
+            "fonts": self.fonts,
+            "spans": self.spans.to_dict(),
+            "layout_blocks": layout,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ParsedDocument":
+        layout = data.get("layout_blocks")
+        if layout is not None:
+            layout = [make_layout_block(*row) for row in layout]
+        spans = data.get("spans")
+        # Version 2 and older stored one list per span
+        spans = SpanTable.from_rows([tuple(s) for s in spans]) if isinstance(spans, list) \
+            else SpanTable.from_dict(spans or {})
+        return cls(
+            doc_id=data.get("doc_id", ""),
+            page_sizes=[tuple(s) for s in data.get("page_sizes", [])],
+            fonts=data.get("fonts", []),
+            spans=spans,
+            layout_blocks=layout,
+            version=data.get("version", 0),
+        )
+
+
+def make_layout_block(text: str, page: int, size: float, font_name: str,
+                      is_bold: bool, x: float, y: float) -> Dict[str, Any]:
+    """Build an OutlineExtractor text block record with its derived fields."""
+    return {
+        'text': text,
+        'page': page,
+        'size': size,
+        'font_name': font_name,
+        'is_bold': is_bold,
+        'x': x,
+        'y': y,
+        'length': len(text),
+        'word_count': len(text.split()),
+        'lines': text.count('\n') + 1
+    }
+
+
+def page_workers_available() -> bool:
+    """Whether this process may start page-range workers.
+
+    Only a top-level process fans out: daemon processes (batch mode) cannot
+    have children, and sandbox workers already run one document each.
+    """
+    return multiprocessing.parent_process() is None
+
+
+def page_shards(page_count: int, workers: int = PAGE_WORKERS,
+                min_pages: int = PAGE_PARALLEL_MIN_PAGES) -> List[Tuple[int, int]]:
+    """Split [0, page_count) into contiguous (start, stop) ranges, one per worker.
+
+    Small documents, a single worker, or a process that cannot start
+    workers get one range covering every page.
+    """
+    if page_count < min_pages or workers <= 1 or not page_workers_available():
+        return [(0, page_count)]
+    shard_size = -(-page_count // workers)
+    return [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+
+
+def map_page_shards(fn: Callable[[str, int, int], Any], pdf_path: str,
+                    shards: List[Tuple[int, int]]) -> List[Any]:
+    """Run fn(pdf_path, start, stop) for every shard, returning results in page order.
+
+    fn must be a module-level function. Runs in-process for a single shard,
+    inside worker processes, or when worker processes cannot be started.
+    """
+    if len(shards) <= 1 or not page_workers_available():
+        return [fn(pdf_path, start, stop) for start, stop in shards]
+    try:
+        with ProcessPoolExecutor(max_workers=len(shards),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(fn, pdf_path, start, stop) for start, stop in shards]
+            return [f.result() for f in futures]
+    except Exception as e:
+        print(f"⚠️  Page-parallel processing failed ({e}), processing pages serially")
+        return [fn(pdf_path, start, stop) for start, stop in shards]
+
+
+def count_pages(pdf_path: str) -> int:
+    doc = fitz.open(pdf_path)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def parse_pdf(pdf_path: str, doc_id: str = "") -> ParsedDocument:
+    """Parse a PDF once with PyMuPDF, collecting text, spans and geometry."""
+    parsed = ParsedDocument(doc_id=doc_id)
+    font_index: Dict[str, int] = {}
+    rows = []
+
+    doc = fitz.open(pdf_path)
+    try:
+        for page_num in range(len(doc)):
+            page = doc[page_num]
+            parsed.page_sizes.append((page.rect.width, page.rect.height))
+
+            # Page text is rebuilt from these spans (see ParsedDocument.page_texts)
+            blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_DICT)
+
+            for block_no, block in enumerate(blocks.get("blocks", [])):
+                for line_no, line in enumerate(block.get("lines", [])):
+                    for span in line["spans"]:
+                        # Whitespace-only spans are kept so block text can be rebuilt
+                        text = span.get("text", "")
+                        if not text:
+                            continue
+                        font_name = span.get("font", "")
+                        font_idx = font_index.get(font_name)
+                        if font_idx is None:
+                            font_idx = font_index[font_name] = len(parsed.fonts)
+                            parsed.fonts.append(font_name)
+                        x0, y0, x1, y1 = span.get("bbox", (0, 0, 0, 0))
+                        rows.append((
+                            page_num, block_no, line_no, x0, y0, x1, y1,
+                            span.get("size", 12), span.get("flags", 0), font_idx, text
+                        ))
+    finally:
+        doc.close()
+
+    parsed.spans = SpanTable.from_rows(rows)
+    return parsed
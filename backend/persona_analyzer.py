@@ -1,12 +1,33 @@
 #!/usr/bin/env python3
 import json
+import multiprocessing
 import os
 import re
-import fitz  # PyMuPDF
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, as_completed
 from datetime import datetime
-from collections import defaultdict, Counter
+from collections import Counter
 from dataclasses import dataclass
-from typing import List, Dict, Any, Tuple
+from itertools import chain
+from typing import List, Dict, Any, Tuple, Callable, FrozenSet, Iterable, Iterator, Optional, Set
+
+import numpy as np
+
+from parsed_document import ParsedDocument, SpanTable, parse_pdf, round_sizes, value_counts, most_common_value
+from sparse_tfidf import DocumentFrequencies, TermMatrix, Vocabulary, safe_divide, tokenize
+
+# Bump whenever analyze_documents output changes so cached persona results are recomputed
+PERSONA_ANALYZER_VERSION = "2"
+# Content lines kept per persona section
+SECTION_MAX_LINES = 30
+# Worker processes extracting candidate sections when no executor is given
+PERSONA_WORKERS = int(os.environ.get("PERSONA_WORKERS", str(max(1, min(8, os.cpu_count() or 1)))))
+# Indexed sections: embedding similarity only counts by how far it rises above
+# the query's baseline (its median similarity to the indexed corpus), as a
+# fraction of the remaining headroom to 1.0. Unrelated text already scores
+# 0.3-0.6 under BGE, so raw similarity would lift every section.
+SEMANTIC_WEIGHT = 5.0
+# Lift that admits a section without lexical evidence
+SEMANTIC_MIN_LIFT = 0.5
 
 @dataclass
 class DocumentSection:
@@ -25,11 +46,73 @@ class SubSectionAnalysis:
     refined_text: str
     page_number: int
 
+@dataclass
+class TextLines:
+    """Columnar text lines of a document, in reading order"""
+    page: np.ndarray
+    y: np.ndarray
+    x: np.ndarray
+    size: np.ndarray
+    is_bold: np.ndarray
+    texts: List[str]
+    
+    @classmethod
+    def empty(cls) -> "TextLines":
+        return cls(np.zeros(0, dtype=np.int32), np.zeros(0), np.zeros(0), np.zeros(0),
+                   np.zeros(0, dtype=bool), [])
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def record(self, i: int) -> Dict[str, Any]:
+        """Line i as a block dict for the heading heuristics"""
+        text = self.texts[i]
+        return {
+            'text': text,
+            'page': int(self.page[i]),
+            'size': float(self.size[i]),
+            'is_bold': bool(self.is_bold[i]),
+            'x': float(self.x[i]),
+            'y': float(self.y[i]),
+            'length': len(text),
+            'word_count': len(text.split())
+        }
+
+@dataclass
+class RelevanceQuery:
+    """Per-request relevance scoring inputs over a shared vocabulary"""
+    keywords: List[str]
+    vocab: Vocabulary
+    idf: np.ndarray             # IDF weight per vocabulary column
+    query_vector: np.ndarray    # TF-IDF of the query tokens
+    query_norm: float
+    query_terms: np.ndarray     # mask of the distinct query tokens
+
 class FontBasedGenericAnalyzer:
-    def __init__(self):
+    def __init__(self, document_loader: Optional[Callable[[str], ParsedDocument]] = None,
+                 document_frequencies: Optional[DocumentFrequencies] = None,
+                 executor: Optional[Executor] = None):
         self.documents = []
         self.persona_keywords = []
         self.job_keywords = []
+        # Maps a PDF path to its ParsedDocument; the API passes the shared cache
+        self.document_loader = document_loader or parse_pdf
+        # Corpus statistics for IDF; the API passes those of the ingested corpus
+        self.document_frequencies = document_frequencies
+        # Runs per-document extraction; the API passes the sandbox, otherwise
+        # a process pool of PERSONA_WORKERS is started per analysis
+        self.executor = executor
+        # Paths analyze_documents could not extract in its last run
+        self.failed_documents: List[str] = []
+        self._parsed_documents: Dict[str, ParsedDocument] = {}
+        
+    def load_document(self, pdf_path: str) -> ParsedDocument:
+        """Parse each document at most once per analyzer instance"""
+        parsed = self._parsed_documents.get(pdf_path)
+        if parsed is None:
+            parsed = self.document_loader(pdf_path)
+            self._parsed_documents[pdf_path] = parsed
+        return parsed
         
     def extract_string_value(self, field_value):
         """Extract string value from any input format"""
@@ -91,61 +174,17 @@ class FontBasedGenericAnalyzer:
         return all_terms
     
     def analyze_document_fonts(self, pdf_path: str) -> Dict[str, Any]:
-        """Analyze font characteristics using PyMuPDF (similar to pdfminer approach)"""
-        doc = fitz.open(pdf_path)
-        font_stats = defaultdict(int)
-        text_blocks = []
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # Extract text with font information
-            blocks = page.get_text("dict")
-            
-            for block in blocks.get("blocks", []):
-                if "lines" in block:
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            text = span.get("text", "").strip()
-                            if not text:
-                                continue
-                            
-                            font_size = span.get("size", 12)
-                            font_flags = span.get("flags", 0)
-                            font_name = span.get("font", "")
-                            
-                            # Detect bold (flag 16 is bold)
-                            is_bold = bool(font_flags & 16)
-                            
-                            # Get position
-                            bbox = span.get("bbox", [0, 0, 0, 0])
-                            x, y = bbox[0], bbox[1]
-                            
-                            block_info = {
-                                'text': text,
-                                'page': page_num + 1,
-                                'size': round(font_size, 1),
-                                'font_name': font_name,
-                                'is_bold': is_bold,
-                                'x': x,
-                                'y': y,
-                                'length': len(text),
-                                'word_count': len(text.split()),
-                                'lines': text.count('\n') + 1
-                            }
-                            
-                            text_blocks.append(block_info)
-                            font_stats[round(font_size, 1)] += 1
-        
-        doc.close()
-        
-        # Determine body text size (most common)
-        body_size = max(font_stats.items(), key=lambda x: x[1])[0] if font_stats else 12.0
+        """Analyze font characteristics from the parsed document's span table"""
+        parsed = self.load_document(pdf_path)
+        spans = parsed.spans.nonblank()
+        sizes = round_sizes(spans.rows['size'])
         
         return {
-            'text_blocks': text_blocks,
-            'font_stats': font_stats,
-            'body_size': body_size
+            'spans': spans,
+            'sizes': sizes,
+            'font_stats': value_counts(sizes),
+            # Body text size is the most common one
+            'body_size': most_common_value(sizes, default=12.0)
         }
     
     def is_valid_heading_generic(self, block: Dict, body_size: float) -> bool:
@@ -207,226 +246,269 @@ class FontBasedGenericAnalyzer:
         # Return true if score is high enough
         return heading_score >= 3
     
-    def group_text_blocks_into_lines(self, text_blocks: List[Dict]) -> List[Dict]:
-        """Group text blocks that are on the same line"""
-        # Sort blocks by page, then y position (top to bottom), then x position
-        sorted_blocks = sorted(text_blocks, key=lambda b: (b['page'], -b['y'], b['x']))
-        
-        grouped_lines = []
-        current_line = []
-        current_y = None
-        current_page = None
-        
-        for block in sorted_blocks:
-            # Check if this block is on the same line as the current line
-            if (current_page == block['page'] and 
-                current_y is not None and 
-                abs(current_y - block['y']) < 5):  # 5-point tolerance for same line
-                current_line.append(block)
-            else:
-                # Start new line
-                if current_line:
-                    # Combine text from current line
-                    combined_text = ' '.join([b['text'] for b in current_line])
-                    # Use properties from first block in line
-                    line_block = current_line[0].copy()
-                    line_block['text'] = combined_text
-                    line_block['word_count'] = len(combined_text.split())
-                    line_block['length'] = len(combined_text)
-                    grouped_lines.append(line_block)
-                
-                current_line = [block]
-                current_y = block['y']
-                current_page = block['page']
-        
-        # Add final line
-        if current_line:
-            combined_text = ' '.join([b['text'] for b in current_line])
-            line_block = current_line[0].copy()
-            line_block['text'] = combined_text
-            line_block['word_count'] = len(combined_text.split())
-            line_block['length'] = len(combined_text)
-            grouped_lines.append(line_block)
-        
-        return grouped_lines
+    def group_text_blocks_into_lines(self, spans: SpanTable, sizes: np.ndarray) -> "TextLines":
+        """Group spans that are on the same line (5-point tolerance from the line's first span)"""
+        if len(spans) == 0:
+            return TextLines.empty()
+        rows = spans.rows
+        
+        # Sort spans by page, then y position (top to bottom), then x position
+        order = np.lexsort((rows['x0'], -rows['y0'], rows['page']))
+        pages = rows['page'][order] + 1
+        ys = rows['y0'][order]
+        y_values = ys.tolist()
+        texts = spans.take(order).texts(stripped=True)
+        
+        # y only decreases within a page, so each line is a run found by
+        # binary search; the exact tolerance test settles the boundary
+        line_starts = []
+        page_bounds = np.flatnonzero(np.r_[True, pages[1:] != pages[:-1], True]).tolist()
+        for page_start, page_end in zip(page_bounds, page_bounds[1:]):
+            neg_y = -ys[page_start:page_end]
+            i = page_start
+            while i < page_end:
+                line_y = y_values[i]
+                j = max(i + 1, page_start + int(np.searchsorted(neg_y, 5 - line_y)))
+                while j > i + 1 and not abs(line_y - y_values[j - 1]) < 5:
+                    j -= 1
+                while j < page_end and abs(line_y - y_values[j]) < 5:
+                    j += 1
+                line_starts.append(i)
+                i = j
+        
+        # Lines take their position and style from their first span
+        bounds = line_starts + [len(texts)]
+        first = order[line_starts]
+        return TextLines(
+            page=pages[line_starts],
+            y=ys[line_starts],
+            x=rows['x0'][first],
+            size=sizes[first],
+            is_bold=(rows['flags'][first] & 16) != 0,  # flag 16 is bold
+            texts=[' '.join(texts[a:b]) for a, b in zip(bounds, bounds[1:])],
+        )
     
-    def extract_content_between_headings(self, all_blocks: List[Dict], 
-                                       heading_block: Dict, next_heading_block: Dict = None) -> str:
-        """Extract content between two headings"""
-        heading_page = heading_block['page']
-        heading_y = heading_block['y']
-        
-        # Find end boundary
-        if next_heading_block:
-            end_page = next_heading_block['page']
-            end_y = next_heading_block['y']
-        else:
-            end_page = heading_page
-            end_y = -1000  # Very low y value to capture rest of page
-        
-        # Collect content blocks
-        content_blocks = []
-        for block in all_blocks:
-            # Check if block is between the two headings
-            is_between = False
-            
-            if block['page'] == heading_page:
-                if next_heading_block and next_heading_block['page'] == heading_page:
-                    # Same page scenario
-                    is_between = block['y'] < heading_y and block['y'] > end_y
-                else:
-                    # Heading is on this page, content extends to next pages
-                    is_between = block['y'] < heading_y
-            elif next_heading_block and block['page'] > heading_page and block['page'] < end_page:
-                # Content on intermediate pages
-                is_between = True
-            elif next_heading_block and block['page'] == end_page and block['y'] > end_y:
-                # Content on final page up to next heading
-                is_between = True
-            
-            if is_between and block != heading_block:
-                content_blocks.append(block['text'])
+    def partition_content_by_headings(self, lines: "TextLines", headings: List[int]) -> List[str]:
+        """Content under each heading (indexes into lines), in one ordered sweep.
         
-        return '\n'.join(content_blocks[:30])  # Limit content size
+        Lines are already in (page, y) reading order with distinct y per
+        page, so every line after a heading belongs to it until the next
+        heading; the last heading keeps only the rest of its page. Each
+        section is capped at its first SECTION_MAX_LINES lines.
+        """
+        texts = lines.texts
+        contents = []
+        for k, start in enumerate(headings):
+            if k + 1 < len(headings):
+                end = headings[k + 1]
+            else:
+                end = int(np.searchsorted(lines.page, lines.page[start], side='right'))
+            contents.append('\n'.join(texts[start + 1:min(end, start + 1 + SECTION_MAX_LINES)]))
+        return contents
     
     # --- TF-IDF utilities (lightweight, no external deps) ---
     @staticmethod
     def _tokenize(text: str) -> List[str]:
-        text = text.lower()
-        return re.findall(r"[a-zA-Z]{3,}", text)
+        return tokenize(text)
 
-    @staticmethod
-    def _tf(tokens: List[str]) -> Dict[str, float]:
-        c = Counter(tokens)
-        total = float(sum(c.values()) or 1)
-        return {t: n / total for t, n in c.items()}
+    def corpus_idf(self, doc_terms: Dict[str, Iterable[str]],
+                   terms: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """IDF over the corpus statistics plus the given {doc_id: terms} documents outside them,
+        restricted to terms when given"""
+        frequencies = self.document_frequencies if self.document_frequencies is not None else DocumentFrequencies()
+        return frequencies.idf(doc_terms, terms=terms)
 
-    @staticmethod
-    def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
-        # dot
-        dot = 0.0
-        for t, wa in a.items():
-            wb = b.get(t)
-            if wb:
-                dot += wa * wb
-        # norms
-        na = (sum(v * v for v in a.values()) or 0.0) ** 0.5
-        nb = (sum(v * v for v in b.values()) or 0.0) ** 0.5
-        if na == 0 or nb == 0:
-            return 0.0
-        return dot / (na * nb)
+    def keyword_terms(self) -> Set[str]:
+        """Distinct tokens of the persona and job keywords"""
+        return set(tokenize(" ".join(self.persona_keywords + self.job_keywords)))
 
-    def _build_idf(self, docs_tokens: List[List[str]]) -> Dict[str, float]:
-        N = max(1, len(docs_tokens))
-        df: Counter[str] = Counter()
-        for toks in docs_tokens:
-            df.update(set(toks))
-        idf: Dict[str, float] = {}
-        for t, d in df.items():
-            idf[t] = max(0.0, (1.0 + (N / (1 + d))) )  # simple smooth idf
-        return idf
+    def build_relevance_query(self, persona_keywords: List[str], job_keywords: List[str],
+                              idf: Dict[str, float]) -> RelevanceQuery:
+        """Vocabulary, IDF weights and query vector, built once per request.
+        
+        The vocabulary holds every term of idf plus the query tokens, so
+        callers restrict idf to the terms of the query and the sections to
+        be scored (see corpus_idf) rather than passing the whole corpus.
+        """
+        keywords = persona_keywords + job_keywords
+        query_text = " ".join(keywords)
+        query_tokens = tokenize(query_text)
+        
+        vocab = Vocabulary(idf)
+        for token in query_tokens:
+            vocab.add(token)
+        idf_weights = vocab.weights(idf)
+        
+        # Query TF-IDF (unigrams only)
+        query = TermMatrix.from_texts([query_text], vocab)
+        query_vector = np.zeros(len(vocab), dtype=np.float64)
+        query_vector[query.indices] = query.data / max(1, len(query_tokens)) * idf_weights[query.indices]
+        query_terms = np.zeros(len(vocab), dtype=bool)
+        query_terms[query.indices] = True
+        
+        return RelevanceQuery(
+            keywords=keywords,
+            vocab=vocab,
+            idf=idf_weights,
+            query_vector=query_vector,
+            query_norm=float(np.sqrt(np.dot(query_vector, query_vector))),
+            query_terms=query_terms,
+        )
 
-    def _tfidf_vec(self, tokens: List[str], idf: Dict[str, float]) -> Dict[str, float]:
-        tf = self._tf(tokens)
-        return {t: tfv * idf.get(t, 0.0) for t, tfv in tf.items()}
+    def score_sections(self, titles: List[str], contents: List[str], filenames: List[str],
+                       query: RelevanceQuery) -> np.ndarray:
+        """Hybrid relevance scores for a batch of sections combining TF-IDF cosine,
+        title/filename matches, coverage and simple density. Generalized, no
+        domain-specific priors."""
+        if not contents:
+            return np.zeros(0, dtype=np.float64)
+        
+        # One section x term count matrix serves every content signal
+        counts = TermMatrix.from_texts(contents, query.vocab)
+        lengths = counts.row_lengths.astype(np.float64)
+        
+        # TF-IDF cosine between query and section content (primary signal)
+        tfidf = counts.scaled(1.0 / np.maximum(lengths, 1.0), query.idf)
+        cosine = safe_divide(tfidf.dot(query.query_vector), tfidf.row_norms() * query.query_norm)
+        scores = 10.0 * cosine
+        
+        # Keyword coverage in content
+        n_query_terms = int(query.query_terms.sum())
+        if n_query_terms:
+            scores += 3.0 * counts.count_present(query.query_terms) / n_query_terms
+        
+        # Light density bonus (normalized). Keywords are counted as substrings
+        # of the lowercased content, so "test" also counts inside "testing"
+        keywords = query.keywords
+        occurrences = np.fromiter((sum(map(content.lower().count, keywords)) for content in contents),
+                                  dtype=np.float64, count=len(contents))
+        scores += np.where(lengths > 0, np.minimum(2.0, safe_divide(occurrences, lengths) * 5.0), 0.0)
+        
+        # Title and filename soft matching boosts, and quality heuristics
+        filename_bonus: Dict[str, float] = {}
+        for i, (title, filename) in enumerate(zip(titles, filenames)):
+            if filename not in filename_bonus:
+                filename_lower = filename.lower()
+                # filename often very indicative
+                filename_bonus[filename] = 1.5 * sum(1 for kw in keywords if kw in filename_lower)
+            title_lower = title.lower()
+            title_matches = sum(1 for kw in keywords if kw in title_lower)
+            scores[i] += 1.25 * title_matches + filename_bonus[filename]
+            
+            title_words = len(title.split())
+            if 3 <= title_words <= 12:
+                scores[i] += 0.5
+            if title_matches >= 2:
+                scores[i] *= 1.05
+        
+        return scores
 
     def calculate_contextual_relevance(self, title: str, content: str,
                                        persona_keywords: List[str], job_keywords: List[str],
                                        idf: Dict[str, float], filename: str) -> float:
-        """Hybrid relevance score combining TF-IDF cosine, title/filename matches,
-        coverage and simple density. Generalized, no domain-specific priors."""
-
-        title_lower = title.lower()
-        content_lower = content.lower()
-        filename_lower = filename.lower()
-
-        # Query tokens from persona + job (unigrams only for cosine)
-        query_text = " ".join(persona_keywords + job_keywords)
-        query_tokens = self._tokenize(query_text)
-        content_tokens = self._tokenize(content_lower)
-
-        # TF-IDF cosine between query and section content
-        q_vec = self._tfidf_vec(query_tokens, idf)
-        s_vec = self._tfidf_vec(content_tokens, idf)
-        cosine = self._cosine(q_vec, s_vec)
-
-        score = 0.0
-        score += 10.0 * cosine  # primary signal
-
-        # Title and filename soft matching boosts
-        title_matches = 0
-        for kw in persona_keywords + job_keywords:
-            if kw in title_lower:
-                score += 1.25
-                title_matches += 1
-            if kw in filename_lower:
-                score += 1.5  # filename often very indicative
-
-        # Keyword coverage in content
-        unique_query = set(query_tokens)
-        if unique_query:
-            hits = sum(1 for t in unique_query if t in content_tokens)
-            coverage = hits / len(unique_query)
-            score += 3.0 * coverage
-
-        # Light density bonus (normalized)
-        if content_tokens:
-            density = sum(content_lower.count(kw) for kw in (persona_keywords + job_keywords)) / max(1, len(content_tokens))
-            score += min(2.0, density * 5.0)
-
-        # Quality heuristics
-        title_words = len(title.split())
-        if 3 <= title_words <= 12:
-            score += 0.5
-        if title_matches >= 2:
-            score *= 1.05
-
-        return float(score)
+        """Relevance of a single section (see score_sections)"""
+        query = self.build_relevance_query(persona_keywords, job_keywords, idf)
+        return float(self.score_sections([title], [content], [filename], query)[0])
     
-    def extract_sections_from_document(self, document_path: str, 
-                                     persona_keywords: List[str], job_keywords: List[str], idf: Dict[str, float]) -> List[DocumentSection]:
-        """Extract sections using font-based analysis"""
+    def extract_candidate_sections(self, document_path: str) -> List[Tuple[int, Dict[str, Any], str]]:
+        """(heading number, heading line, content) for every heading with enough content"""
         filename = os.path.basename(document_path)
         
         # Analyze document fonts
         font_analysis = self.analyze_document_fonts(document_path)
-        text_blocks = font_analysis['text_blocks']
+        spans = font_analysis['spans']
         body_size = font_analysis['body_size']
         
-        if not text_blocks:
+        if len(spans) == 0:
             return []
         
-        print(f"[DEBUG] Processing {filename}: {len(text_blocks)} text blocks, body size: {body_size}")
+        print(f"[DEBUG] Processing {filename}: {len(spans)} text blocks, body size: {body_size}")
         
         # Group text blocks into lines
-        line_blocks = self.group_text_blocks_into_lines(text_blocks)
+        lines = self.group_text_blocks_into_lines(spans, font_analysis['sizes'])
         
-        # Identify headings
+        # Identify headings as (line index, line record) pairs
         headings = []
-        for block in line_blocks:
+        for line_index in range(len(lines)):
+            block = lines.record(line_index)
             if self.is_valid_heading_generic(block, body_size):
-                headings.append(block)
+                headings.append((line_index, block))
         
         print(f"[DEBUG] Found {len(headings)} headings in {filename}")
-        for heading in headings[:5]:
+        for _, heading in headings[:5]:
             print(f"  - '{heading['text'][:50]}...' (size: {heading['size']}, bold: {heading['is_bold']})")
         
-        # Extract sections
+        contents = self.partition_content_by_headings(lines, [line_index for line_index, _ in headings])
+        return [(i, heading, section_content)
+                for i, ((_, heading), section_content) in enumerate(zip(headings, contents))
+                if len(section_content.strip()) >= 20]
+    
+    def extract_document_candidates(self, document_path: str) -> Tuple[str, List[Tuple[int, Dict[str, Any], str]], FrozenSet[str]]:
+        """(doc_id, candidate sections, distinct terms of the candidates) of one document"""
+        candidates = self.extract_candidate_sections(document_path)
+        doc_id = self.load_document(document_path).doc_id or document_path
+        terms = frozenset(chain.from_iterable(tokenize(f"{heading['text']}\n{content}")
+                                              for _, heading, content in candidates))
+        return doc_id, candidates, terms
+    
+    def iter_candidates(self, document_paths: List[str]) -> Iterator[Tuple[int, Optional[Tuple[str, List[Tuple[int, Dict[str, Any], str]], FrozenSet[str]]]]]:
+        """(position, extract_document_candidates result) per document, as each one finishes.
+        
+        Documents are extracted concurrently on self.executor or a process
+        pool of PERSONA_WORKERS. None marks a document that failed.
+        """
+        if self.executor is not None:
+            futures = {self.executor.submit(extract_document_candidates, path, self.document_loader): i
+                       for i, path in enumerate(document_paths)}
+            for future in as_completed(futures):
+                i = futures[future]
+                yield i, self._candidates_result(document_paths[i], future)
+            return
+        
+        workers = min(PERSONA_WORKERS, len(document_paths))
+        pool = None
+        if workers > 1:
+            try:
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            except Exception as e:
+                print(f"[WARN] Parallel extraction unavailable ({e}), processing documents serially")
+        if pool is None:
+            for i, path in enumerate(document_paths):
+                yield i, self._candidates_result(path)
+            return
+        with pool:
+            futures = {pool.submit(extract_document_candidates, path, self.document_loader): i
+                       for i, path in enumerate(document_paths)}
+            for future in as_completed(futures):
+                i = futures[future]
+                # A document whose worker failed is retried in-process
+                yield i, self._candidates_result(document_paths[i], future, retry=True)
+    
+    def extract_all_candidates(self, document_paths: List[str]) -> List[Optional[Tuple[str, List[Tuple[int, Dict[str, Any], str]], FrozenSet[str]]]]:
+        """iter_candidates results in input order, so they never depend on completion order"""
+        extracted = [None] * len(document_paths)
+        for i, result in self.iter_candidates(document_paths):
+            extracted[i] = result
+        return extracted
+    
+    def _candidates_result(self, document_path: str, future: Optional[Future] = None, retry: bool = False):
+        try:
+            if future is not None:
+                try:
+                    return future.result()
+                except Exception:
+                    if not retry:
+                        raise
+            return self.extract_document_candidates(document_path)
+        except Exception as e:
+            print(f"[ERROR] Processing {document_path}: {e}")
+            return None
+    
+    def sections_from_candidates(self, filename: str, candidates: List[Tuple[int, Dict[str, Any], str]],
+                                 scores: np.ndarray) -> List[DocumentSection]:
+        """Scored candidates above the relevance threshold, as DocumentSections"""
         sections = []
-        for i, heading in enumerate(headings):
-            next_heading = headings[i + 1] if i + 1 < len(headings) else None
-            
-            # Extract content for this heading
-            section_content = self.extract_content_between_headings(line_blocks, heading, next_heading)
-            
-            if len(section_content.strip()) < 20:
-                continue
-            
-            # Calculate relevance using hybrid scorer
-            relevance = self.calculate_contextual_relevance(
-                heading['text'], section_content, persona_keywords, job_keywords, idf, filename
-            )
-            
+        for (i, heading, section_content), relevance in zip(candidates, scores.tolist()):
             print(f"[DEBUG] '{heading['text'][:40]}...': relevance = {relevance:.3f}")
             
             if relevance > 1.0:  # Reasonable threshold
@@ -444,6 +526,19 @@ class FontBasedGenericAnalyzer:
         
         return sections
     
+    def extract_sections_from_document(self, document_path: str, 
+                                     persona_keywords: List[str], job_keywords: List[str], idf: Dict[str, float],
+                                     query: Optional[RelevanceQuery] = None) -> List[DocumentSection]:
+        """Extract sections using font-based analysis"""
+        filename = os.path.basename(document_path)
+        candidates = self.extract_candidate_sections(document_path)
+        if query is None:
+            query = self.build_relevance_query(persona_keywords, job_keywords, idf)
+        scores = self.score_sections([heading['text'] for _, heading, _ in candidates],
+                                     [content for _, _, content in candidates],
+                                     [filename] * len(candidates), query)
+        return self.sections_from_candidates(filename, candidates, scores)
+    
     def intelligent_section_ranking(self, sections: List[DocumentSection]) -> List[DocumentSection]:
         """Rank sections intelligently with diversity"""
         if not sections:
@@ -542,6 +637,58 @@ class FontBasedGenericAnalyzer:
     
     def analyze_documents(self, document_paths: List[str], persona, job_description) -> Dict[str, Any]:
         """Main analysis method using font-based approach"""
+        persona_str, job_str = self._prepare_query(persona, job_description)
+        
+        # Extract candidate sections per document in parallel, then score and rank them here in one batch
+        extracted = self.extract_all_candidates(document_paths)
+        self.failed_documents = [path for path, item in zip(document_paths, extracted) if item is None]
+        all_sections = self._score_extracted(document_paths, extracted)
+        
+        print(f"[DEBUG] Total sections found: {len(all_sections)}")
+        return self._build_result([os.path.basename(path) for path in document_paths],
+                                  persona_str, job_str, all_sections)
+    
+    def iter_analysis(self, document_paths: List[str], persona, job_description,
+                      provisional_top: int = 5) -> Iterator[Dict[str, Any]]:
+        """analyze_documents as a stream of progress events.
+        
+        Yields a "document" event as each document finishes (in completion
+        order) with the provisional top sections ranked over every document
+        finished so far, then one "result" event with exactly the result
+        analyze_documents would return.
+        """
+        persona_str, job_str = self._prepare_query(persona, job_description)
+        
+        extracted = [None] * len(document_paths)
+        finished: List[int] = []
+        for i, item in self.iter_candidates(document_paths):
+            extracted[i] = item
+            finished.append(i)
+            event = {
+                "event": "document",
+                "document": os.path.basename(document_paths[i]),
+                "completed": len(finished),
+                "total": len(document_paths),
+                "failed": item is None,
+            }
+            if provisional_top > 0:
+                done = sorted(finished)
+                sections = self._score_extracted([document_paths[k] for k in done], [extracted[k] for k in done])
+                event["extracted_sections"] = self._section_summaries(
+                    self.intelligent_section_ranking(sections)[:provisional_top])
+            yield event
+        
+        self.failed_documents = [path for path, item in zip(document_paths, extracted) if item is None]
+        all_sections = self._score_extracted(document_paths, extracted)
+        print(f"[DEBUG] Total sections found: {len(all_sections)}")
+        yield {
+            "event": "result",
+            "result": self._build_result([os.path.basename(path) for path in document_paths],
+                                         persona_str, job_str, all_sections),
+        }
+    
+    def _prepare_query(self, persona, job_description) -> Tuple[str, str]:
+        """Persona and job strings, with their keywords set on the analyzer"""
         print(f"[DEBUG] Starting FONT-BASED GENERIC analysis")
         
         # Convert inputs
@@ -556,42 +703,108 @@ class FontBasedGenericAnalyzer:
         self.job_keywords = self.extract_adaptive_keywords(job_str)
         
         print(f"[DEBUG] Keywords: {(self.persona_keywords + self.job_keywords)[:20]}")
-        
-        # Build a temporary corpus to compute IDF across documents at the section level.
-        # We first do a quick text extraction per document to approximate tokens for IDF.
-        preview_tokens_per_doc: List[List[str]] = []
-        for doc_path in document_paths:
-            try:
-                # lightweight page text extraction using PyMuPDF
-                d = fitz.open(doc_path)
-                text = []
-                for p in d:
-                    if len(text) > 5:  # limit to first ~6 pages for speed
-                        break
-                    text.append(p.get_text() or "")
-                d.close()
-                preview_tokens_per_doc.append(self._tokenize("\n".join(text)))
-            except Exception:
-                preview_tokens_per_doc.append([])
-
-        idf = self._build_idf(preview_tokens_per_doc)
-
-        # Extract sections from all documents using the computed IDF
-        all_sections = []
-        for doc_path in document_paths:
-            try:
-                doc_sections = self.extract_sections_from_document(doc_path, self.persona_keywords, self.job_keywords, idf)
-                all_sections.extend(doc_sections)
-            except Exception as e:
-                print(f"[ERROR] Processing {doc_path}: {e}")
+        return persona_str, job_str
+    
+    def _score_extracted(self, document_paths: List[str], extracted: List[Optional[Tuple]]) -> List[DocumentSection]:
+        """Relevant sections of the extracted documents, scored in one batch with a shared IDF"""
+        candidates_per_doc = []
+        doc_terms: Dict[str, FrozenSet[str]] = {}
+        for doc_path, item in zip(document_paths, extracted):
+            if item is None:
                 continue
+            doc_id, candidates, terms = item
+            candidates_per_doc.append((os.path.basename(doc_path), candidates))
+            if self.document_frequencies is None or doc_id not in self.document_frequencies:
+                # Not in the corpus statistics: counts with the terms of its candidate sections
+                doc_terms[doc_id] = terms
+        
+        # Only the query's and the candidates' terms can carry weight
+        terms = self.keyword_terms().union(*(item[2] for item in extracted if item is not None))
+        idf = self.corpus_idf(doc_terms, terms)
+        query = self.build_relevance_query(self.persona_keywords, self.job_keywords, idf)
+        
+        flat = [(filename, c) for filename, candidates in candidates_per_doc for c in candidates]
+        scores = self.score_sections([heading['text'] for _, (_, heading, _) in flat],
+                                     [content for _, (_, _, content) in flat],
+                                     [filename for filename, _ in flat], query)
+        all_sections = []
+        offset = 0
+        for filename, candidates in candidates_per_doc:
+            all_sections.extend(self.sections_from_candidates(
+                filename, candidates, scores[offset:offset + len(candidates)]))
+            offset += len(candidates)
+        return all_sections
+    
+    def analyze_indexed_sections(self, sections: List[DocumentSection], semantic_scores: np.ndarray,
+                                 semantic_baseline: float, input_documents: List[str],
+                                 persona, job_description) -> Dict[str, Any]:
+        """Persona analysis over already-extracted sections (e.g. from the semantic index).
+        
+        semantic_scores holds each section's embedding similarity to the
+        persona and job text, and semantic_baseline the similarity that text
+        has to typical corpus content (see SemanticIndex.doc_similarities). A
+        section is kept when its lexical score passes the font-based path's
+        threshold, or its similarity lifts well above the baseline (see
+        semantic_lift); the lift also adds to the ranking score.
+        """
+        persona_str = self.extract_string_value(persona)
+        job_str = self.extract_string_value(job_description)
+        self.persona_keywords = self.extract_adaptive_keywords(persona_str)
+        self.job_keywords = self.extract_adaptive_keywords(job_str)
         
-        print(f"[DEBUG] Total sections found: {len(all_sections)}")
+        # Indexed documents are part of the corpus statistics; without them,
+        # IDF is taken over the documents of the given sections
+        doc_terms: Dict[str, set] = {}
+        terms = self.keyword_terms()
+        for section in sections:
+            section_terms = tokenize(section.content)
+            terms.update(section_terms)
+            if self.document_frequencies is None:
+                doc_terms.setdefault(section.document, set()).update(section_terms)
+        # Only the query's and the sections' terms can carry weight
+        idf = self.corpus_idf(doc_terms, terms)
+        query = self.build_relevance_query(self.persona_keywords, self.job_keywords, idf)
+        
+        lexical = self.score_sections([s.section_title for s in sections], [s.content for s in sections],
+                                      [s.document for s in sections], query)
+        lift = self.semantic_lift(semantic_scores, semantic_baseline)
+        relevance = lexical + SEMANTIC_WEIGHT * lift
+        # Same lexical threshold as the font-based path
+        keep = (lexical > 1.0) | (lift >= SEMANTIC_MIN_LIFT)
         
+        all_sections = []
+        for section, score, kept in zip(sections, relevance.tolist(), keep.tolist()):
+            if kept:
+                section.relevance_score = score
+                all_sections.append(section)
+        
+        print(f"[DEBUG] Indexed sections: {len(sections)}, relevant: {len(all_sections)}")
+        return self._build_result(input_documents, persona_str, job_str, all_sections)
+    
+    @staticmethod
+    def semantic_lift(similarities: np.ndarray, baseline: float) -> np.ndarray:
+        """Similarity above baseline, scaled to [0, 1] by the headroom left to 1.0"""
+        similarities = np.asarray(similarities, dtype=np.float64)
+        return np.clip((similarities - baseline) / max(1.0 - baseline, 1e-6), 0.0, 1.0)
+    
+    @staticmethod
+    def _section_summaries(sections: List[DocumentSection]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "document": section.document,
+                "section_title": section.section_title,
+                "importance_rank": section.importance_rank,
+                "page_number": section.page_number
+            }
+            for section in sections
+        ]
+    
+    def _build_result(self, input_documents: List[str], persona_str: str, job_str: str,
+                      all_sections: List[DocumentSection]) -> Dict[str, Any]:
         if not all_sections:
             return {
                 "metadata": {
-                    "input_documents": [os.path.basename(path) for path in document_paths],
+                    "input_documents": input_documents,
                     "persona": persona_str,
                     "job_to_be_done": job_str,
                     "processing_timestamp": datetime.now().isoformat(),
@@ -610,20 +823,12 @@ class FontBasedGenericAnalyzer:
         # Prepare result
         result = {
             "metadata": {
-                "input_documents": [os.path.basename(path) for path in document_paths],
+                "input_documents": input_documents,
                 "persona": persona_str,
                 "job_to_be_done": job_str,
                 "processing_timestamp": datetime.now().isoformat()
             },
-            "extracted_sections": [
-                {
-                    "document": section.document,
-                    "section_title": section.section_title,
-                    "importance_rank": section.importance_rank,
-                    "page_number": section.page_number
-                }
-                for section in final_sections[:5]
-            ],
+            "extracted_sections": self._section_summaries(final_sections[:5]),
             "subsection_analysis": [
                 {
                     "document": sub.document,
@@ -640,6 +845,11 @@ class FontBasedGenericAnalyzer:
         
         return result
 
+def extract_document_candidates(document_path: str,
+                                document_loader: Optional[Callable[[str], ParsedDocument]] = None):
+    """Worker entry point: FontBasedGenericAnalyzer.extract_document_candidates for one document"""
+    return FontBasedGenericAnalyzer(document_loader=document_loader).extract_document_candidates(document_path)
+
 # Maintain compatibility
 PersonaDocumentAnalyzer = FontBasedGenericAnalyzer
 
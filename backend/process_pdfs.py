@@ -2,149 +2,434 @@
 import os
 import json
 import time
+import argparse
+import hashlib
+import multiprocessing
+from multiprocessing import connection as mp_connection
 from pathlib import Path
+import fitz  # PyMuPDF
+import numpy as np
 from pdfminer.high_level import extract_pages
 from pdfminer.layout import LTTextContainer, LTChar
 import re
-from collections import defaultdict, Counter
+from collections import Counter
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Tuple
+
+from parsed_document import parse_pdf, make_layout_block, page_shards, map_page_shards, count_pages
+
+
+# Layout backends understood by OutlineExtractor.analyze_fonts
+PDFMINER_BACKEND = "pdfminer"
+PYMUPDF_BACKEND = "pymupdf"
+LAYOUT_BACKENDS = (PDFMINER_BACKEND, PYMUPDF_BACKEND)
+DEFAULT_LAYOUT_BACKEND = os.environ.get("OUTLINE_LAYOUT_BACKEND", PDFMINER_BACKEND)
+
+# Bump whenever extract_outline output changes so cached outlines are rebuilt
+OUTLINE_EXTRACTOR_VERSION = "2"
+
+# extract_outline "source" values: the PDF's own bookmarks or layout heuristics
+EMBEDDED_TOC_SOURCE = "embedded_toc"
+LAYOUT_SOURCE = "layout"
+# Use the embedded TOC (bookmarks) when it passes the sanity checks
+USE_EMBEDDED_TOC = os.environ.get("OUTLINE_USE_EMBEDDED_TOC", "1").lower() not in ("0", "false", "no")
+
+# Batch mode (process_all_pdfs) settings
+BATCH_JOBS = int(os.environ.get("OUTLINE_BATCH_JOBS", str(os.cpu_count() or 1)))
+BATCH_FILE_TIMEOUT = float(os.environ.get("OUTLINE_FILE_TIMEOUT", "10"))
+BATCH_MANIFEST_NAME = ".outline_manifest.json"
+BATCH_REPORT_NAME = ".run_report.json"
+
+# Documents containing these phrases number their pages from 0
+ZERO_BASED_PAGE_MARKERS = ['stem pathways', 'topjump', 'party invitation']
+
+# Three or more of these phrases mark a form, which gets an empty outline
+FORM_INDICATORS = [
+    'application form', 'ltc advance', 'government servant',
+    'permanent or temporary', 'home town', 'designation'
+]
+
+
+def _combine(patterns):
+    """One alternation regex for a pattern list (None when empty)"""
+    return re.compile('|'.join(f'(?:{p})' for p in patterns)) if patterns else None
+
+
+# Every phrase looked up in a document's full lowercased text (page numbering,
+# title rules, form detection and document typing), found in a single scan.
+# The lookahead reports a match at every position; phrases contained in a
+# longer match are implied by it.
+_DOCUMENT_KEYWORDS = sorted(
+    set(ZERO_BASED_PAGE_MARKERS) | set(FORM_INDICATORS) | {
+        'pathway options', 'ltc', 'rfp', 'request for proposal', 'overview', 'foundation level'
+    },
+    key=len, reverse=True
+)
+_DOCUMENT_KEYWORDS_RE = re.compile('(?=(' + '|'.join(map(re.escape, _DOCUMENT_KEYWORDS)) + '))')
+_IMPLIED_KEYWORDS = {kw: frozenset(k for k in _DOCUMENT_KEYWORDS if k in kw) for kw in _DOCUMENT_KEYWORDS}
+
+# Obvious non-headings (anchored at the start of the lowercased text)
+_SKIP_HEADING_RE = _combine([
+    r'^\.+$', r'^\d+\.?\s*$', r'^[a-z]\)?\s*$',
+    r'^page \d+ of \d+$', r'^version \d+\.\d+$',
+    r'^\d{1,2} \w+ \d{4}$', r'^copyright.*\d{4}$'
+])
+
+# Content patterns that make a block a heading, per document type
+_HEADING_RES = {
+    'rfp': _combine([
+        r"ontario.{0,20}digital library", r"critical component", r"prosperity strategy",
+        r"^summary$", r"^background$", r"^timeline:", r"business plan.*developed",
+        r"approach and specific", r"evaluation and awarding", r"appendix [abc]:",
+        r"equitable access", r"shared decision", r"shared governance", r"shared funding",
+        r"local points", r"access:", r"guidance", r"training:", r"provincial purchasing",
+        r"technological support", r"what could.*odl", r"for each ontario.*could mean:",
+        r"milestones", r"phase [ivx]+:", r"preamble", r"terms of reference",
+        r"membership", r"appointment criteria", r"chair", r"meetings",
+        r"lines of accountability", r"financial and administrative", r"envisioned electronic",
+        r"^\d+\.\s+", r"steering committee"
+    ]),
+    'istqb': _combine([
+        r"revision history", r"table of contents", r"acknowledgements?",
+        r"^\d+\.\s+introduction", r"^\d+\.\s+overview", r"^\d+\.\s+references?",
+        r"^\d+\.\d+\s+", r"syllabus", r"business outcomes", r"content$",
+        r"trademarks", r"documents and web", r"foundation level.*extension",
+        r"agile tester", r"intended audience", r"career paths", r"learning objectives",
+        r"entry requirements", r"structure and course", r"keeping it current"
+    ]),
+    'stem': _combine([
+        r"stem pathways", r"pathway options", r"elective course offerings",
+        r"what colleges say"
+    ]),
+}
+
+# (H1, H2, H3, H4) content patterns per document type, checked in level order
+_LEVEL_RES = {
+    'rfp': tuple(map(_combine, (
+        [r"ontario.{0,20}digital library", r"critical component.*prosperity"],
+        [r"^summary$", r"^background$", r"business plan.*developed",
+         r"approach and specific", r"evaluation and awarding", r"appendix [abc]:"],
+        [r"timeline:", r"milestones", r"equitable access", r"shared decision",
+         r"shared governance", r"shared funding", r"local points", r"access:",
+         r"guidance", r"training:", r"provincial purchasing", r"technological support",
+         r"what could.*odl", r"phase [ivx]+:", r"preamble", r"terms of reference",
+         r"membership", r"appointment criteria", r"chair", r"meetings",
+         r"lines of accountability", r"financial and administrative",
+         r"envisioned electronic", r"^\d+\.\s+"],
+        [r"for each ontario.*could mean:"],
+    ))),
+    'istqb': tuple(map(_combine, (
+        [r"revision history", r"table of contents", r"acknowledgements?",
+         r"^\d+\.\s+introduction", r"^\d+\.\s+overview", r"^\d+\.\s+references?"],
+        [r"^\d+\.\d+\s+", r"syllabus", r"business outcomes", r"content$",
+         r"trademarks", r"documents and web"],
+        [r"foundation level.*extension", r"agile tester", r"international software"],
+        [],
+    ))),
+    'stem': tuple(map(_combine, (
+        [r"stem pathways"],
+        [r"pathway options", r"elective course offerings"],
+        [r"what colleges say"],
+        [],
+    ))),
+    'default': tuple(map(_combine, (
+        [r"^\d+\.\s+"],
+        [r"^\d+\.\d+\s+"],
+        [r".*:$"],
+        [],
+    ))),
+}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_NUMBERED_PREFIX_RE = re.compile(r'^\d+\.\s')
+
+
+def _largest_text_on_page(page):
+    """Text of the largest-font lines on a PyMuPDF page (the usual title)"""
+    lines = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            spans = [span for span in line.get("spans", []) if span.get("text", "").strip()]
+            if spans:
+                lines.append((max(span["size"] for span in spans), ''.join(span["text"] for span in spans)))
+    if not lines:
+        return ""
+    max_size = max(size for size, _ in lines)
+    return _WHITESPACE_RE.sub(' ', ' '.join(text for size, text in lines if size >= max_size * 0.95)).strip()
+
+
+def find_document_keywords(text_lower):
+    """Set of _DOCUMENT_KEYWORDS occurring in text_lower (one regex scan)"""
+    found = set()
+    for match in _DOCUMENT_KEYWORDS_RE.finditer(text_lower):
+        keyword = match.group(1)
+        if keyword not in found:
+            found |= _IMPLIED_KEYWORDS[keyword]
+    return found
+
+
+def _pdfminer_page_range(pdf_path, start=0, stop=None):
+    """pdfminer layout pass over pages [start, stop) (every page when stop is None).
+    
+    Returns the lowercased text of every non-empty container (for page
+    numbering markers) and the block records with 0-based page indexes.
+    """
+    temp_blocks = []
+    page_blocks = []
+    page_numbers = range(start, stop) if stop is not None else None
+    for page_index, page in enumerate(extract_pages(pdf_path, page_numbers=page_numbers), start=start):
+        for element in page:
+            if isinstance(element, LTTextContainer):
+                text = element.get_text().strip()
+                if not text:
+                    continue
+                temp_blocks.append(text.lower())
+                    
+                # Get font characteristics
+                chars = [ch for line in element for ch in line if isinstance(ch, LTChar)]
+                if not chars:
+                    continue
+                
+                # Calculate average font size
+                avg_size = sum(ch.size for ch in chars) / len(chars)
+                
+                # Font name analysis
+                font_names = [getattr(ch, 'fontname', '') for ch in chars]
+                most_common_font = Counter(font_names).most_common(1)[0][0] if font_names else ''
+                
+                # Style detection
+                is_bold = any('bold' in font.lower() for font in font_names if font)
+                
+                page_blocks.append(make_layout_block(
+                    text, page_index, round(avg_size, 1),
+                    most_common_font, is_bold, element.x0, element.y0
+                ))
+    return temp_blocks, page_blocks
+
+
+_LEVEL_NAMES = {1: 'H1', 2: 'H2', 3: 'H3', 4: 'H4'}
+
+
+@dataclass(frozen=True)
+class DocumentAnalysis:
+    """Immutable per-document result of OutlineExtractor.analyze_fonts.
+    
+    text_blocks are layout block records (see make_layout_block) and must be
+    treated as read-only: they may be shared with a cached ParsedDocument.
+    """
+    text_blocks: Tuple[Dict[str, Any], ...] = ()
+    # Block count per rounded font size, in first-seen order
+    font_stats: Mapping[float, int] = field(default_factory=lambda: MappingProxyType({}))
+    # Keywords present in the document's lowercased text
+    document_keywords: FrozenSet[str] = frozenset()
+    
+    @property
+    def body_size(self):
+        """Most common block font size (first seen wins ties), or None"""
+        if not self.font_stats:
+            return None
+        return max(self.font_stats.items(), key=lambda x: x[1])[0]
+
+
+def _make_analysis(text_blocks):
+    text_blocks = tuple(text_blocks)
+    return DocumentAnalysis(
+        text_blocks=text_blocks,
+        font_stats=MappingProxyType(dict(Counter(block['size'] for block in text_blocks))),
+        document_keywords=frozenset(find_document_keywords(
+            ' '.join(block['text'] for block in text_blocks).lower()
+        )),
+    )
 
 
 class OutlineExtractor:
-    def __init__(self):
-        self.font_stats = defaultdict(int)
-        self.text_blocks = []
-        self.extracted_title = ""
+    """Reentrant outline pipeline.
+    
+    The extractor holds no per-document state: analyze_fonts returns a
+    DocumentAnalysis that the later stages take as an argument, so a single
+    instance (see get_outline_extractor) can serve concurrent requests.
+    """
+    
+    def analyze_fonts(self, pdf_path, parsed=None, backend=None):
+        """Extract font information with flexible page numbering.
         
-    def analyze_fonts(self, pdf_path):
-        """Extract font information with flexible page numbering"""
-        self.font_stats.clear()
-        self.text_blocks.clear()
+        backend selects the layout engine: "pdfminer" (default) or "pymupdf".
+        When a ParsedDocument is given, the pdfminer backend reuses its cached
+        layout blocks and attaches freshly computed ones for later callers;
+        the pymupdf backend builds blocks from its spans.
+        """
+        backend = backend or DEFAULT_LAYOUT_BACKEND
+        if backend == PYMUPDF_BACKEND:
+            text_blocks = self._analyze_fonts_pymupdf(pdf_path, parsed)
+        elif backend == PDFMINER_BACKEND:
+            text_blocks = self._analyze_fonts_pdfminer(pdf_path, parsed)
+        else:
+            raise ValueError(f"Unknown layout backend: {backend}")
+        return _make_analysis(text_blocks)
+    
+    def _analyze_fonts_pdfminer(self, pdf_path, parsed=None):
+        """pdfminer.six layout analysis (one block per LTTextContainer)"""
+        if parsed is not None and parsed.layout_blocks is not None:
+            return parsed.layout_blocks
+        
+        # Single layout pass: collect blocks with 0-based page indexes and the
+        # marker text, then apply the page-numbering offset afterwards.
+        # Large documents are split into page ranges analyzed in parallel.
+        try:
+            page_count = parsed.page_count if parsed is not None else count_pages(pdf_path)
+            shards = page_shards(page_count)
+        except Exception:
+            shards = [(0, None)]
+        if len(shards) > 1:
+            print(f"Analyzing {page_count} pages in {len(shards)} parallel page ranges")
+        else:
+            # Let pdfminer walk every page itself
+            shards = [(0, None)]
         
-        # Determine document type for page numbering
         temp_blocks = []
-        for page_num, page in enumerate(extract_pages(pdf_path)):
-            for element in page:
-                if isinstance(element, LTTextContainer):
-                    text = element.get_text().strip().lower()
-                    if text:
-                        temp_blocks.append(text)
+        page_blocks = []
+        for shard_texts, shard_blocks in map_page_shards(_pdfminer_page_range, pdf_path, shards):
+            temp_blocks.extend(shard_texts)
+            page_blocks.extend(shard_blocks)
         
-        all_temp_text = ' '.join(temp_blocks)
+        markers = find_document_keywords(' '.join(temp_blocks))
         
         # Determine starting page number based on document type
-        if any(indicator in all_temp_text for indicator in ['stem pathways', 'topjump', 'party invitation']):
+        if any(indicator in markers for indicator in ZERO_BASED_PAGE_MARKERS):
             start_page = 0
         else:
             start_page = 1
         
-        for page_num, page in enumerate(extract_pages(pdf_path), start=start_page):
-            for element in page:
-                if isinstance(element, LTTextContainer):
-                    text = element.get_text().strip()
-                    if not text:
-                        continue
-                        
-                    # Get font characteristics
-                    chars = [ch for line in element for ch in line if isinstance(ch, LTChar)]
-                    if not chars:
-                        continue
-                    
-                    # Calculate average font size
-                    avg_size = sum(ch.size for ch in chars) / len(chars)
-                    
-                    # Font name analysis
-                    font_names = [getattr(ch, 'fontname', '') for ch in chars]
-                    most_common_font = Counter(font_names).most_common(1)[0][0] if font_names else ''
-                    
-                    # Style detection
-                    is_bold = any('bold' in font.lower() for font in font_names if font)
-                    
-                    block_info = {
-                        'text': text,
-                        'page': page_num,
-                        'size': round(avg_size, 1),
-                        'font_name': most_common_font,
-                        'is_bold': is_bold,
-                        'x': element.x0,
-                        'y': element.y0,
-                        'length': len(text),
-                        'word_count': len(text.split()),
-                        'lines': text.count('\n') + 1
-                    }
-                    
-                    self.text_blocks.append(block_info)
-                    self.font_stats[round(avg_size, 1)] += 1
+        for block_info in page_blocks:
+            block_info['page'] += start_page
+        
+        if parsed is not None:
+            parsed.layout_blocks = page_blocks
+        return page_blocks
+    
+    def _analyze_fonts_pymupdf(self, pdf_path, parsed=None):
+        """PyMuPDF layout analysis (one block per get_text("dict") block).
+        
+        Records mirror the pdfminer ones: sizes and font names are weighted by
+        character count, and y is converted to PDF bottom-up coordinates.
+        """
+        if parsed is None:
+            parsed = parse_pdf(pdf_path)
+        spans = parsed.spans
+        if len(spans) == 0:
+            return []
+        rows = spans.rows
+        
+        # Block and line boundaries: rows are in (page, block, line) order
+        new_block = np.ones(len(rows), dtype=bool)
+        new_block[1:] = (rows['page'][1:] != rows['page'][:-1]) | (rows['block'][1:] != rows['block'][:-1])
+        new_line = new_block.copy()
+        new_line[1:] |= rows['line'][1:] != rows['line'][:-1]
+        block_starts = np.flatnonzero(new_block)
+        block_ids = np.cumsum(new_block) - 1
+        
+        # Per-block geometry and character-weighted font size
+        chars = (rows['end'] - rows['start']).astype(np.float64)
+        total_chars = np.add.reduceat(chars, block_starts)
+        sizes = np.add.reduceat(rows['size'] * chars, block_starts) / total_chars
+        x0 = np.minimum.reduceat(rows['x0'], block_starts)
+        page_heights = np.array([height for _, height in parsed.page_sizes], dtype=np.float64)
+        block_pages = rows['page'][block_starts]
+        y = page_heights[block_pages] - np.maximum.reduceat(rows['y1'], block_starts)
+        
+        # Bold if any font in the block is; the most common font by characters
+        # (ties go to the font seen first) names the block
+        font_is_bold = np.array(['bold' in font.lower() for font in parsed.fonts] or [False])
+        is_bold = np.logical_or.reduceat(font_is_bold[rows['font']], block_starts)
+        n_fonts = max(1, len(parsed.fonts))
+        keys, first_seen, inverse = np.unique(block_ids * n_fonts + rows['font'],
+                                              return_index=True, return_inverse=True)
+        weights = np.bincount(inverse, weights=chars)
+        key_blocks = keys // n_fonts
+        order = np.lexsort((first_seen, -weights, key_blocks))
+        best = order[np.r_[True, key_blocks[order][1:] != key_blocks[order][:-1]]]
+        block_fonts = np.zeros(len(block_starts), dtype=np.int64)
+        block_fonts[key_blocks[best]] = keys[best] % n_fonts
+        
+        # Block text: spans of a line are contiguous in the text buffer
+        line_starts = np.flatnonzero(new_line)
+        line_ends = np.r_[line_starts[1:], len(rows)] - 1
+        buffer = spans.text
+        line_texts = [buffer[a:b] for a, b in zip(rows['start'][line_starts].tolist(),
+                                                  rows['end'][line_ends].tolist())]
+        line_bounds = np.searchsorted(line_starts, np.r_[block_starts, len(rows)]).tolist()
+        texts = ['\n'.join(line_texts[a:b]).strip() for a, b in zip(line_bounds, line_bounds[1:])]
+        
+        # Determine starting page number based on document type
+        markers = find_document_keywords(' '.join(t for t in texts if t).lower())
+        start_page = 0 if any(indicator in markers for indicator in ZERO_BASED_PAGE_MARKERS) else 1
+        
+        fonts = parsed.fonts
+        text_blocks = []
+        for text, page_index, size, font_idx, bold, bx, by in zip(
+                texts, block_pages.tolist(), sizes.tolist(), block_fonts.tolist(),
+                is_bold.tolist(), x0.tolist(), y.tolist()):
+            if not text:
+                continue
+            text_blocks.append(make_layout_block(
+                text, page_index + start_page, round(size, 1),
+                fonts[font_idx] if fonts else '', bold, bx, by
+            ))
+        return text_blocks
     
-    def extract_title(self):
+    def extract_title(self, analysis):
         """Extract title with document-type specific logic"""
-        first_page_blocks = [b for b in self.text_blocks if b['page'] in [0, 1]]
+        first_page_blocks = [b for b in analysis.text_blocks if b['page'] in [0, 1]]
         
         if not first_page_blocks:
-            self.extracted_title = ""
             return ""
         
-        all_text = ' '.join([b['text'].lower() for b in self.text_blocks])
+        keywords = analysis.document_keywords
         
         # Document type detection
-        if any(indicator in all_text for indicator in ['stem pathways', 'pathway options']):
-            self.extracted_title = ""
+        if any(indicator in keywords for indicator in ['stem pathways', 'pathway options']):
             return ""
-        elif 'topjump' in all_text or 'party invitation' in all_text:
-            self.extracted_title = ""
+        elif 'topjump' in keywords or 'party invitation' in keywords:
             return ""
-        elif 'application form' in all_text and 'ltc' in all_text:
+        elif 'application form' in keywords and 'ltc' in keywords:
             max_size = max(block['size'] for block in first_page_blocks)
             title_block = max([b for b in first_page_blocks if b['size'] >= max_size * 0.95], 
                             key=lambda b: b['size'])
             title = title_block['text'].strip()
-            title = re.sub(r'\s+', ' ', title)
-            self.extracted_title = title.lower()
-            return title
-        elif 'rfp' in all_text or 'request for proposal' in all_text:
-            title = "RFP: Request for Proposal To Present a Proposal for Developing the Business Plan for the Ontario Digital Library"
-            self.extracted_title = title.lower()
-            return title
-        elif 'overview' in all_text and 'foundation level' in all_text:
+            return _WHITESPACE_RE.sub(' ', title)
+        elif 'rfp' in keywords or 'request for proposal' in keywords:
+            return "RFP: Request for Proposal To Present a Proposal for Developing the Business Plan for the Ontario Digital Library"
+        elif 'overview' in keywords and 'foundation level' in keywords:
             title_parts = []
             large_blocks = sorted([b for b in first_page_blocks if b['size'] >= 14.0], 
                                 key=lambda b: -b['y'])[:3]
             for block in large_blocks:
                 text = block['text'].strip()
-                if len(text) > 3 and not re.match(r'^\d+\.\s', text):
+                if len(text) > 3 and not _NUMBERED_PREFIX_RE.match(text):
                     title_parts.append(text)
             
             title = ' '.join(title_parts) if title_parts else "Overview Foundation Level Extensions"
-            title = re.sub(r'\s+', ' ', title)
-            self.extracted_title = title.lower()
-            return title
+            return _WHITESPACE_RE.sub(' ', title)
         else:
             max_size = max(block['size'] for block in first_page_blocks)
             title_block = max([b for b in first_page_blocks if b['size'] >= max_size * 0.95], 
                             key=lambda b: b['size'])
             title = title_block['text'].strip()
-            title = re.sub(r'\s+', ' ', title)
-            self.extracted_title = title.lower()
-            return title
+            return _WHITESPACE_RE.sub(' ', title)
     
-    def is_form_document(self):
+    def is_form_document(self, analysis):
         """Detect if this is a form that should have empty outline"""
-        all_text = ' '.join([block['text'].lower() for block in self.text_blocks])
-        
-        form_indicators = [
-            'application form', 'ltc advance', 'government servant',
-            'permanent or temporary', 'home town', 'designation'
-        ]
-        
-        form_count = sum(1 for indicator in form_indicators if indicator in all_text)
+        form_count = sum(1 for indicator in FORM_INDICATORS if indicator in analysis.document_keywords)
         return form_count >= 3
     
-    def is_valid_heading(self, block, body_size, doc_type):
-        """Document-type specific heading validation"""
+    def is_valid_heading(self, block, body_size, doc_type, title_key=""):
+        """Document-type specific heading validation (title_key: lowercased title)"""
         text = block['text'].strip()
         text_lower = text.lower()
         
         # Skip if this is the title text
-        if text_lower == self.extracted_title:
+        if text_lower == title_key:
             return False
         
         # Basic filters
@@ -152,13 +437,7 @@ class OutlineExtractor:
             return False
         
         # Skip obvious non-headings
-        skip_patterns = [
-            r'^\.+$', r'^\d+\.?\s*$', r'^[a-z]\)?\s*$',
-            r'^page \d+ of \d+$', r'^version \d+\.\d+$',
-            r'^\d{1,2} \w+ \d{4}$', r'^copyright.*\d{4}$'
-        ]
-        
-        if any(re.match(pattern, text_lower) for pattern in skip_patterns):
+        if _SKIP_HEADING_RE.match(text_lower):
             return False
         
         # Font size requirement
@@ -170,44 +449,17 @@ class OutlineExtractor:
                 return False
             
             # RFP document - comprehensive patterns
-            rfp_patterns = [
-                r"ontario.{0,20}digital library", r"critical component", r"prosperity strategy",
-                r"^summary$", r"^background$", r"^timeline:", r"business plan.*developed",
-                r"approach and specific", r"evaluation and awarding", r"appendix [abc]:",
-                r"equitable access", r"shared decision", r"shared governance", r"shared funding",
-                r"local points", r"access:", r"guidance", r"training:", r"provincial purchasing",
-                r"technological support", r"what could.*odl", r"for each ontario.*could mean:",
-                r"milestones", r"phase [ivx]+:", r"preamble", r"terms of reference",
-                r"membership", r"appointment criteria", r"chair", r"meetings",
-                r"lines of accountability", r"financial and administrative", r"envisioned electronic",
-                r"^\d+\.\s+", r"steering committee"
-            ]
-            
-            has_pattern = any(re.search(pattern, text_lower) for pattern in rfp_patterns)
+            has_pattern = _HEADING_RES['rfp'].search(text_lower) is not None
             return has_pattern or (size_ratio >= 1.2 and len(text) < 100)
             
         elif doc_type == 'istqb':
             # ISTQB document patterns
-            istqb_patterns = [
-                r"revision history", r"table of contents", r"acknowledgements?",
-                r"^\d+\.\s+introduction", r"^\d+\.\s+overview", r"^\d+\.\s+references?",
-                r"^\d+\.\d+\s+", r"syllabus", r"business outcomes", r"content$",
-                r"trademarks", r"documents and web", r"foundation level.*extension",
-                r"agile tester", r"intended audience", r"career paths", r"learning objectives",
-                r"entry requirements", r"structure and course", r"keeping it current"
-            ]
-            
-            has_pattern = any(re.search(pattern, text_lower) for pattern in istqb_patterns)
+            has_pattern = _HEADING_RES['istqb'].search(text_lower) is not None
             return has_pattern or (size_ratio >= 1.2 and len(text) < 100)
             
         elif doc_type == 'stem':
             # STEM document patterns
-            stem_patterns = [
-                r"stem pathways", r"pathway options", r"elective course offerings",
-                r"what colleges say"
-            ]
-            
-            has_pattern = any(re.search(pattern, text_lower) for pattern in stem_patterns)
+            has_pattern = _HEADING_RES['stem'].search(text_lower) is not None
             return has_pattern or (size_ratio >= 1.2 and len(text) < 80)
             
         else:
@@ -218,68 +470,11 @@ class OutlineExtractor:
         """Get the natural heading level based on content (before hierarchy enforcement)"""
         text_lower = text.lower().strip()
         
-        if doc_type == 'rfp':
-            # RFP specific level mapping
-            h1_patterns = [
-                r"ontario.{0,20}digital library", r"critical component.*prosperity"
-            ]
-            h2_patterns = [
-                r"^summary$", r"^background$", r"business plan.*developed",
-                r"approach and specific", r"evaluation and awarding", r"appendix [abc]:"
-            ]
-            h3_patterns = [
-                r"timeline:", r"milestones", r"equitable access", r"shared decision",
-                r"shared governance", r"shared funding", r"local points", r"access:",
-                r"guidance", r"training:", r"provincial purchasing", r"technological support",
-                r"what could.*odl", r"phase [ivx]+:", r"preamble", r"terms of reference",
-                r"membership", r"appointment criteria", r"chair", r"meetings",
-                r"lines of accountability", r"financial and administrative",
-                r"envisioned electronic", r"^\d+\.\s+"
-            ]
-            h4_patterns = [
-                r"for each ontario.*could mean:"
-            ]
-            
-        elif doc_type == 'istqb':
-            # ISTQB specific level mapping
-            h1_patterns = [
-                r"revision history", r"table of contents", r"acknowledgements?",
-                r"^\d+\.\s+introduction", r"^\d+\.\s+overview", r"^\d+\.\s+references?"
-            ]
-            h2_patterns = [
-                r"^\d+\.\d+\s+", r"syllabus", r"business outcomes", r"content$",
-                r"trademarks", r"documents and web"
-            ]
-            h3_patterns = [
-                r"foundation level.*extension", r"agile tester", r"international software"
-            ]
-            h4_patterns = []
-            
-        elif doc_type == 'stem':
-            # STEM specific level mapping
-            h1_patterns = [r"stem pathways"]
-            h2_patterns = [r"pathway options", r"elective course offerings"]
-            h3_patterns = [r"what colleges say"]
-            h4_patterns = []
-            
-        else:
-            # Default patterns
-            h1_patterns = [r"^\d+\.\s+"]
-            h2_patterns = [r"^\d+\.\d+\s+"]
-            h3_patterns = [r".*:$"]
-            h4_patterns = []
-        
         # Check patterns in order
-        if any(re.search(pattern, text_lower) for pattern in h1_patterns):
-            return 1
-        elif any(re.search(pattern, text_lower) for pattern in h2_patterns):
-            return 2
-        elif any(re.search(pattern, text_lower) for pattern in h3_patterns):
-            return 3
-        elif any(re.search(pattern, text_lower) for pattern in h4_patterns):
-            return 4
-        else:
-            return 3  # Default
+        for level, pattern in enumerate(_LEVEL_RES.get(doc_type, _LEVEL_RES['default']), start=1):
+            if pattern is not None and pattern.search(text_lower):
+                return level
+        return 3  # Default
     
     def enforce_page_hierarchy(self, page_headings):
         """Enforce proper hierarchical flow within a page"""
@@ -314,65 +509,135 @@ class OutlineExtractor:
                     final_level = min(current_level + 1, 4)
                     current_level = final_level
             
-            # Convert numeric level back to H1, H2, H3, H4
-            level_map = {1: 'H1', 2: 'H2', 3: 'H3', 4: 'H4'}
-            
             result.append({
-                'level': level_map[final_level],
+                'level': _LEVEL_NAMES[final_level],
                 'text': heading['text'],
                 'page': heading['page']
             })
         
         return result
     
-    def get_document_type(self):
+    def get_document_type(self, analysis):
         """Determine document type for processing"""
-        all_text = ' '.join([block['text'].lower() for block in self.text_blocks])
+        keywords = analysis.document_keywords
         
-        if 'rfp' in all_text or 'request for proposal' in all_text:
+        if 'rfp' in keywords or 'request for proposal' in keywords:
             return 'rfp'
-        elif 'overview' in all_text and 'foundation level' in all_text:
+        elif 'overview' in keywords and 'foundation level' in keywords:
             return 'istqb'
-        elif 'stem pathways' in all_text:
+        elif 'stem pathways' in keywords:
             return 'stem'
         else:
             return 'default'
     
-    def extract_outline(self, pdf_path):
-        """Main extraction method with hierarchical enforcement"""
+    def extract_embedded_toc(self, pdf_path):
+        """Outline from the PDF's bookmarks, or None if it fails the sanity checks.
+        
+        Entries deeper than H4, without a target page or with empty titles are
+        dropped; the rest must be mostly in page order and point inside the
+        document.
+        """
+        doc = fitz.open(pdf_path)
+        try:
+            toc = doc.get_toc(simple=True)
+            page_count = len(doc)
+            title = _WHITESPACE_RE.sub(' ', (doc.metadata or {}).get('title') or '').strip()
+            if toc and not title and page_count:
+                title = _largest_text_on_page(doc[0])
+        finally:
+            doc.close()
+        
+        if len(toc) < 2 or page_count == 0:
+            return None
+        
+        outline = []
+        seen = set()
+        for level, text, page in toc:
+            text = _WHITESPACE_RE.sub(' ', text or '').strip()
+            if level > 4 or len(text) < 2 or page < 1:
+                continue
+            if page > page_count:
+                # Points outside the document: bookmarks are not trustworthy
+                return None
+            key = (text.lower(), page)
+            if key in seen:
+                continue
+            seen.add(key)
+            outline.append({'level': f'H{level}', 'text': text, 'page': page})
+        
+        if len(outline) < 2 or outline[0]['level'] != 'H1':
+            return None
+        
+        # Bookmarks that jump back and forth are usually hand-made or broken
+        in_order = sum(1 for a, b in zip(outline, outline[1:]) if b['page'] >= a['page'])
+        if in_order < 0.8 * (len(outline) - 1):
+            return None
+        
+        return {"title": title, "outline": outline, "source": EMBEDDED_TOC_SOURCE}
+    
+    def embedded_toc_outline(self, pdf_path, use_toc=None):
+        """The embedded TOC outline when the fast path is enabled and the TOC is sane, else None.
+        
+        Needs no parsed document, so callers can try it before parsing.
+        """
+        if not (USE_EMBEDDED_TOC if use_toc is None else use_toc):
+            return None
+        try:
+            return self.extract_embedded_toc(pdf_path)
+        except Exception as e:
+            print(f"Could not read embedded TOC, using layout analysis: {e}")
+            return None
+    
+    def extract_outline(self, pdf_path, parsed=None, backend=None, use_toc=None):
+        """Main extraction method with hierarchical enforcement.
+        
+        The embedded TOC is used when present and sane (unless use_toc is
+        False); otherwise layout analysis runs. The result's "source" says
+        which path produced it.
+        """
+        result = self.embedded_toc_outline(pdf_path, use_toc)
+        if result is not None:
+            return result
+        
+        result = self._extract_layout_outline(pdf_path, parsed, backend)
+        result["source"] = LAYOUT_SOURCE
+        return result
+    
+    def _extract_layout_outline(self, pdf_path, parsed=None, backend=None):
+        """Font-statistics and heuristic outline extraction"""
         try:
-            self.analyze_fonts(pdf_path)
+            analysis = self.analyze_fonts(pdf_path, parsed, backend)
             
-            if not self.text_blocks:
+            if not analysis.text_blocks:
                 return {"title": "", "outline": []}
             
             # Extract title
-            title = self.extract_title()
+            title = self.extract_title(analysis)
+            title_key = title.lower()
             
             # Check if this is a form
-            if self.is_form_document():
+            if self.is_form_document(analysis):
                 return {"title": title, "outline": []}
             
             # Determine document type
-            doc_type = self.get_document_type()
+            doc_type = self.get_document_type(analysis)
             
             # Determine body text size
-            if not self.font_stats:
+            body_size = analysis.body_size
+            if body_size is None:
                 return {"title": title, "outline": []}
             
-            body_size = max(self.font_stats.items(), key=lambda x: x[1])[0]
-            
             # Extract potential headings with base levels
             potential_headings = []
             seen_texts = set()
             
             # Sort blocks by page and position
-            sorted_blocks = sorted(self.text_blocks, key=lambda b: (b['page'], -b['y']))
+            sorted_blocks = sorted(analysis.text_blocks, key=lambda b: (b['page'], -b['y']))
             
             for block in sorted_blocks:
-                if self.is_valid_heading(block, body_size, doc_type):
+                if self.is_valid_heading(block, body_size, doc_type, title_key):
                     text = block['text'].strip()
-                    text = re.sub(r'\s+', ' ', text)
+                    text = _WHITESPACE_RE.sub(' ', text)
                     text_key = text.lower()
                     
                     # Avoid duplicates
@@ -415,69 +680,261 @@ class OutlineExtractor:
             return {"title": "", "outline": []}
 
 
-def process_all_pdfs():
-    """Process all PDFs in input directory and generate JSON outputs"""
-    input_dir = Path("/app/input")
-    output_dir = Path("/app/output")
+# Shared instance: the extractor is stateless, so threads may use it concurrently
+_GLOBAL_OUTLINE_EXTRACTOR = OutlineExtractor()
+
+
+def get_outline_extractor():
+    return _GLOBAL_OUTLINE_EXTRACTOR
+
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_json(path, data):
+    """Write JSON atomically so an interrupted run never leaves a torn output"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _load_manifest(output_dir):
+    try:
+        with open(output_dir / BATCH_MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_up_to_date(pdf_file, output_path, manifest_entry):
+    """Output was produced by the current backend, extractor version and
+    embedded-TOC setting, and is newer than the PDF or was produced from
+    identical bytes.
+    
+    Fallback outputs written for timed-out or failed files are never up to date.
+    """
+    entry = manifest_entry or {}
+    if not output_path.exists() or entry.get("status") != "processed" \
+            or entry.get("backend") != DEFAULT_LAYOUT_BACKEND \
+            or entry.get("version") != OUTLINE_EXTRACTOR_VERSION \
+            or entry.get("embedded_toc") != USE_EMBEDDED_TOC:
+        return False, None
+    if output_path.stat().st_mtime >= pdf_file.stat().st_mtime:
+        return True, None
+    digest = _file_sha1(pdf_file)
+    return entry.get("sha1") == digest, digest
+
+
+def _outline_worker(conn):
+    """Batch worker process: extract outlines for the paths it receives until the pipe closes"""
+    while True:
+        try:
+            pdf_path = conn.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            reply = ("ok", get_outline_extractor().extract_outline(pdf_path))
+        except Exception as e:
+            reply = ("error", str(e))
+        conn.send(reply)
+
+
+def _start_outline_worker(ctx):
+    parent_conn, child_conn = ctx.Pipe()
+    proc = ctx.Process(target=_outline_worker, args=(child_conn,), daemon=True)
+    proc.start()
+    child_conn.close()
+    return parent_conn, proc
+
+
+def _run_batch(pdf_files, jobs, timeout):
+    """Feed files to at most `jobs` reusable worker processes.
+    
+    A worker is only replaced when it crashes or exceeds timeout seconds on
+    a file (it is killed then); timeout 0 disables the limit. Yields
+    (pdf_file, status, result, elapsed) as files finish, where status is
+    "processed", "error" or "timeout".
+    """
+    ctx = multiprocessing.get_context()
+    pending = list(pdf_files)
+    idle = []  # (parent connection, process) of workers waiting for a file
+    running = {}  # parent connection -> (pdf_file, process, start time)
+    
+    try:
+        while pending or running:
+            while pending and len(running) < jobs:
+                conn, proc = idle.pop() if idle else _start_outline_worker(ctx)
+                pdf_file = pending.pop(0)
+                conn.send(str(pdf_file))
+                running[conn] = (pdf_file, proc, time.monotonic())
+            
+            wait = None
+            if timeout > 0:
+                next_deadline = min(start + timeout for _, _, start in running.values())
+                wait = max(0.0, next_deadline - time.monotonic())
+            ready = mp_connection.wait(list(running), timeout=wait)
+            
+            for conn in ready:
+                pdf_file, proc, start = running.pop(conn)
+                try:
+                    status, payload = conn.recv()
+                    idle.append((conn, proc))
+                except EOFError:
+                    conn.close()
+                    proc.join()
+                    status, payload = "error", f"worker exited with code {proc.exitcode}"
+                if status == "ok":
+                    yield pdf_file, "processed", payload, time.monotonic() - start
+                else:
+                    yield pdf_file, "error", payload, time.monotonic() - start
+            
+            if timeout > 0:
+                now = time.monotonic()
+                for conn, (pdf_file, proc, start) in list(running.items()):
+                    if now - start >= timeout:
+                        proc.kill()
+                        proc.join()
+                        conn.close()
+                        del running[conn]
+                        yield pdf_file, "timeout", None, now - start
+    finally:
+        # Idle workers exit when their pipe closes; busy ones are killed
+        for conn, proc in idle:
+            conn.close()
+            proc.join(timeout=5)
+        for conn, (_, proc, _) in running.items():
+            proc.kill()
+            proc.join()
+            conn.close()
+
+
+def process_all_pdfs(input_dir="/app/input", output_dir="/app/output", jobs=None,
+                     timeout=None, force=False, report_path=None):
+    """Process all PDFs in input directory and generate JSON outputs.
+    
+    PDFs are processed by a pool of `jobs` reusable worker processes. Inputs
+    whose output was produced by the current layout backend and extractor
+    version, and is newer than the PDF or was produced from identical bytes,
+    are skipped unless force is set. A file that errors or exceeds `timeout`
+    seconds (0 disables the limit) gets the empty-outline fallback. A JSON run report with per-file timings and
+    throughput is written to report_path (default: <output_dir>/.run_report.json).
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    jobs = max(1, jobs or BATCH_JOBS)
+    timeout = BATCH_FILE_TIMEOUT if timeout is None else timeout
+    report_path = Path(report_path) if report_path else output_dir / BATCH_REPORT_NAME
     
     # Ensure output directory exists
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Initialize extractor
-    extractor = OutlineExtractor()
-    
     # Process all PDF files
-    pdf_files = list(input_dir.glob("*.pdf"))
+    pdf_files = sorted(input_dir.glob("*.pdf"))
     
     if not pdf_files:
         print("No PDF files found in input directory")
         return
     
-    print(f"Found {len(pdf_files)} PDF files to process")
+    limit = f"{timeout:g}s per file" if timeout > 0 else "no per-file timeout"
+    print(f"Found {len(pdf_files)} PDF files to process ({jobs} jobs, {limit})")
+    run_start = time.time()
     
+    manifest = _load_manifest(output_dir)
+    digests = {}
+    files_report = []
+    todo = []
     for pdf_file in pdf_files:
-        start_time = time.time()
+        output_path = output_dir / (pdf_file.stem + ".json")
+        up_to_date, digest = (False, None) if force else \
+            _is_up_to_date(pdf_file, output_path, manifest.get(pdf_file.name))
+        digests[pdf_file] = digest
+        if up_to_date:
+            print(f"Skipping: {pdf_file.name} (output up to date)")
+            files_report.append({"file": pdf_file.name, "status": "skipped", "seconds": 0.0})
+        else:
+            todo.append(pdf_file)
+    
+    for pdf_file, status, result, elapsed in _run_batch(todo, jobs, timeout):
+        output_filename = pdf_file.stem + ".json"
+        if status == "processed":
+            print(f"Generated: {output_filename} (took {elapsed:.2f}s)")
+        elif status == "timeout":
+            print(f"Timeout: {pdf_file.name} exceeded {timeout:g}s, writing empty outline")
+        else:
+            print(f"Error processing {pdf_file.name}: {result}")
+        
+        # Errors and timeouts fall back to an empty outline
+        if status == "processed":
+            # Output files keep the title/outline schema; the source goes to the report
+            output = {"title": result.get("title", ""), "outline": result.get("outline", [])}
+        else:
+            output = {"title": "", "outline": []}
+        _write_json(output_dir / output_filename, output)
         
         try:
-            print(f"Processing: {pdf_file.name}")
-            
-            # Extract outline
-            result = extractor.extract_outline(str(pdf_file))
-            
-            # Generate output filename
-            output_filename = pdf_file.stem + ".json"
-            output_path = output_dir / output_filename
-            
-            # Write JSON output
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
-            
-            elapsed_time = time.time() - start_time
-            print(f"Generated: {output_filename} (took {elapsed_time:.2f}s)")
-            
-            # Performance check
-            if elapsed_time > 10:
-                print(f"Warning: Processing took {elapsed_time:.2f}s > 10s limit")
+            pages = count_pages(str(pdf_file))
+        except Exception:
+            pages = 0
+        manifest[pdf_file.name] = {
+            "sha1": digests[pdf_file] or _file_sha1(pdf_file),
+            "backend": DEFAULT_LAYOUT_BACKEND,
+            "version": OUTLINE_EXTRACTOR_VERSION,
+            "embedded_toc": USE_EMBEDDED_TOC,
+            "status": status,  # failed files are retried on the next run
+        }
         
-        except Exception as e:
-            print(f"Error processing {pdf_file.name}: {e}")
-            
-            # Generate error output
-            error_result = {
-                "title": "",
-                "outline": []
-            }
-            
-            output_filename = pdf_file.stem + ".json"
-            output_path = output_dir / output_filename
-            
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(error_result, f, indent=2)
+        entry = {"file": pdf_file.name, "status": status, "seconds": round(elapsed, 3),
+                 "pages": pages, "headings": len(output.get("outline", []))}
+        if status == "processed":
+            entry["source"] = result.get("source", LAYOUT_SOURCE)
+        if status == "error":
+            entry["error"] = result
+        files_report.append(entry)
+    
+    _write_json(output_dir / BATCH_MANIFEST_NAME, manifest)
+    
+    wall_seconds = time.time() - run_start
+    done = [f for f in files_report if f["status"] != "skipped"]
+    total_pages = sum(f.get("pages", 0) for f in done)
+    counts = Counter(f["status"] for f in files_report)
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(run_start)),
+        "jobs": jobs,
+        "timeout_seconds": timeout,
+        "files": sorted(files_report, key=lambda f: f["file"]),
+        "summary": {
+            "total": len(files_report),
+            "processed": counts["processed"],
+            "skipped": counts["skipped"],
+            "timeouts": counts["timeout"],
+            "errors": counts["error"],
+            "embedded_toc": sum(1 for f in files_report if f.get("source") == EMBEDDED_TOC_SOURCE),
+            "wall_seconds": round(wall_seconds, 3),
+            "files_per_second": round(len(done) / wall_seconds, 3) if wall_seconds > 0 else None,
+            "pages_per_second": round(total_pages / wall_seconds, 3) if wall_seconds > 0 else None,
+        },
+    }
+    _write_json(report_path, report)
+    print(f"Run report written to {report_path}: {report['summary']}")
+    return report
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract outlines for every PDF in a directory")
+    parser.add_argument("--input", default="/app/input", help="Directory of input PDFs")
+    parser.add_argument("--output", default="/app/output", help="Directory for JSON outputs")
+    parser.add_argument("--jobs", type=int, default=BATCH_JOBS, help="Worker processes")
+    parser.add_argument("--timeout", type=float, default=BATCH_FILE_TIMEOUT, help="Per-file timeout in seconds (0 disables it)")
+    parser.add_argument("--force", action="store_true", help="Reprocess files whose output is up to date")
+    parser.add_argument("--report", help="Run report path (default: <output>/.run_report.json)")
+    args = parser.parse_args()
+    
     print("Starting PDF Outline Extraction...")
-    process_all_pdfs()
+    process_all_pdfs(args.input, args.output, args.jobs, args.timeout, args.force, args.report)
     print("Processing completed.")
-
-
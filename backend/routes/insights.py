@@ -1,11 +1,17 @@
 from fastapi import APIRouter, HTTPException, Body
 import os
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from services.corpus_stats import get_corpus_stats
 
 
-def generate_fallback_insights(selection: str, matches: List[Dict[str, Any]]) -> Dict[str, List[str]]:
-    """Generate intelligent fallback insights when LLM is not available"""
+def generate_fallback_insights(selection: str, matches: List[Dict[str, Any]],
+                               idf: Optional[Dict[str, float]] = None) -> Dict[str, List[str]]:
+    """Generate intelligent fallback insights when LLM is not available
+    
+    idf (corpus IDF per term) ranks key terms by how distinctive they are
+    across the ingested documents, not just by frequency in the selection.
+    """
     insights = []
     
     # Analyze the selection text
@@ -16,8 +22,11 @@ def generate_fallback_insights(selection: str, matches: List[Dict[str, Any]]) ->
         if len(word) > 3:  # Skip short words
             word_freq[word] = word_freq.get(word, 0) + 1
     
-    # Get key terms (most frequent words)
-    key_terms = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:5]
+    # Get key terms (most frequent words, weighted by corpus IDF when available;
+    # words the corpus has never seen count as the most distinctive)
+    idf = idf or {}
+    unseen_weight = max(idf.values(), default=1.0)
+    key_terms = sorted(word_freq.items(), key=lambda x: x[1] * idf.get(x[0], unseen_weight), reverse=True)[:5]
     key_terms = [term for term, freq in key_terms if freq > 1]
     
     # Generate insights based on content analysis
@@ -98,7 +107,8 @@ async def insights(
     api_key_env = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
     if not api_key_env:
         # Generate intelligent fallback insights based on content analysis
-        return generate_fallback_insights(selection, matches)
+        idf = get_corpus_stats().idf(terms=re.findall(r'\b\w+\b', selection.lower()))
+        return generate_fallback_insights(selection, matches, idf)
 
     try:
         genai.configure(api_key=api_key_env)
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body
 from fastapi.responses import FileResponse
 from models.outline_models import OutlineResponse
-from services.outline_service import save_and_get_docid, get_pdf_path, extract_outline_from_file
+from services.outline_service import (
+    save_upload_and_get_docid, get_pdf_path, extract_outline_from_file, delete_docs_by_ids
+)
 from services.storage_service import StorageType
 import os
-import tempfile
 
 
 router = APIRouter()
@@ -27,20 +28,17 @@ async def outline(
     storage_type_enum: StorageType = storage_type  # type: ignore
 
     if file:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-        doc_id = save_and_get_docid(tmp_path, file.filename, storage_type_enum)
-        path = tmp_path
+        doc_id, path = await save_upload_and_get_docid(file, file.filename, storage_type_enum)
     else:
         doc_id = docId  # type: ignore
         path = get_pdf_path(doc_id)
         if not os.path.exists(path):
             raise HTTPException(404, "docId not found")
 
-    result = extract_outline_from_file(path)
+    result = extract_outline_from_file(path, doc_id)
     return OutlineResponse(
-        docId=doc_id, title=result.get("title", ""), outline=result.get("outline", [])
+        docId=doc_id, title=result.get("title", ""), outline=result.get("outline", []),
+        source=result.get("source", "layout"),
     )
 
 
@@ -56,9 +54,8 @@ def serve_pdf(docId: str):
 def delete_pdf(docId: str):
     path = get_pdf_path(docId)
     if os.path.exists(path):
-        try:
-            os.remove(path)
-        except Exception:
+        # Removes every filename the document is stored under, then its caches
+        if not delete_docs_by_ids([docId])["removed"]:
             raise HTTPException(500, "Failed to delete file")
         return {"deleted": [docId]}
     return {"deleted": []}
@@ -66,17 +63,8 @@ def delete_pdf(docId: str):
 
 @router.delete("/files")
 def delete_pdfs(docIds: list[str] = Body(..., embed=True)):
-    deleted: list[str] = []
-    for did in docIds or []:
-        path = get_pdf_path(did)
-        if os.path.exists(path):
-            try:
-                os.remove(path)
-                deleted.append(did)
-            except Exception:
-                # best-effort per file
-                continue
-    return {"deleted": deleted}
+    # best-effort per file
+    return {"deleted": delete_docs_by_ids(docIds or [])["removed"]}
 
 
 @router.post("/files/delete")
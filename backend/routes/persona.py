@@ -1,9 +1,10 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import List
+import json
 import os
-import tempfile
-from services.outline_service import save_and_get_docid, get_pdf_path
-from services.persona_service import analyze_persona
+from services.outline_service import save_upload_and_get_docid, get_pdf_path
+from services.persona_service import analyze_persona, analyze_persona_indexed, stream_persona
 from models.persona_models import PersonaAnalyzeResponse
 
 
@@ -16,17 +17,53 @@ async def persona_analyze(
     jobToBeDone: str = Form(...),
     files: List[UploadFile] | None = File(default=None),
     docIds: List[str] | None = Form(default=None),
+    mode: str = Form("auto"),
 ):
+    # auto: use the semantic index when every docId is ingested, else parse;
+    # index: require ingested docIds; parse: always parse the PDFs
+    if mode not in ("auto", "index", "parse"):
+        raise HTTPException(400, f"Unknown mode: {mode}")
+    if mode == "index" and (files or not docIds):
+        raise HTTPException(400, "Index mode takes docIds only")
+
+    paths = await _input_paths(files, docIds)
+
+    if docIds and not files and mode != "parse":
+        doc_filenames = {did: os.path.basename(p) for did, p in zip(docIds, paths)}
+        result = analyze_persona_indexed(persona, jobToBeDone, doc_filenames)
+        if result is not None:
+            return PersonaAnalyzeResponse(**result)
+        if mode == "index":
+            raise HTTPException(409, "Some docIds are not in the semantic index; ingest them first")
+
+    result = analyze_persona(persona, jobToBeDone, paths)
+    return PersonaAnalyzeResponse(**result)
+
+
+@router.post("/persona/analyze/stream")
+async def persona_analyze_stream(
+    persona: str = Form(...),
+    jobToBeDone: str = Form(...),
+    files: List[UploadFile] | None = File(default=None),
+    docIds: List[str] | None = Form(default=None),
+):
+    """Parse-mode analysis streamed as NDJSON: a "start" event, one "document"
+    event per finished document with the provisional top sections, then the
+    "result" event carrying the same body as /persona/analyze."""
+    paths = await _input_paths(files, docIds)
+    events = (json.dumps(event, ensure_ascii=False) + "\n" for event in stream_persona(persona, jobToBeDone, paths))
+    # X-Accel-Buffering: nginx would otherwise hold events back until the response ends
+    return StreamingResponse(events, media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def _input_paths(files: List[UploadFile] | None, docIds: List[str] | None) -> List[str]:
     paths: List[str] = []
 
     if files:
         for f in files:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                tmp.write(await f.read())
-                tmp_path = tmp.name
             # Persist to store and use the stored path for analysis so filenames match docIds
-            doc_id = save_and_get_docid(tmp_path, f.filename)
-            stored_path = get_pdf_path(doc_id)
+            doc_id, stored_path = await save_upload_and_get_docid(f, f.filename)
             paths.append(stored_path)
 
     if docIds:
@@ -38,7 +75,4 @@ async def persona_analyze(
 
     if not paths:
         raise HTTPException(400, "No inputs (files or docIds)")
-    result = analyze_persona(persona, jobToBeDone, paths)
-    return PersonaAnalyzeResponse(**result)
-
-
+    return paths
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional, Union
 import os
-import tempfile
 
-from services.outline_service import save_and_get_docid, get_pdf_path
+from services.outline_service import save_upload_and_get_docid, get_pdf_path
 from services.storage_service import StorageType
 from services.semantic_index import get_index
 
@@ -16,6 +16,7 @@ async def ingest(
     files: Optional[List[UploadFile]] = File(default=None),
     docIds: Optional[List[str]] = Form(default=None),
     storage_type: str = Form(default="fresh"),  # bulk, fresh, or viewer
+    background: bool = Form(default=False),  # return once the first pages are searchable
 ):
     print(f"🔄 INGEST: Starting ingestion process...")
     print(f"   Files: {len(files) if files else 0}")
@@ -32,11 +33,7 @@ async def ingest(
     items = []
     if files:
         for f in files:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                tmp.write(await f.read())
-                tmp_path = tmp.name
-            doc_id = save_and_get_docid(tmp_path, f.filename, storage_type_enum)
-            path = get_pdf_path(doc_id, storage_type_enum)
+            doc_id, path = await save_upload_and_get_docid(f, f.filename, storage_type_enum)
             items.append((doc_id, path))
             print(f"   📄 Prepared file: {f.filename} -> {doc_id} at {path}")
     
@@ -76,7 +73,11 @@ async def ingest(
     idx = get_index()
     print(f"📊 INGEST: Current index state: {len(idx.sections)} sections")
     
-    result = idx.ingest_documents(items)
+    # Off the event loop so queries keep being served while increments are published
+    if background:
+        result = await run_in_threadpool(idx.ingest_in_background, items)
+    else:
+        result = await run_in_threadpool(idx.ingest_documents, items)
     print(f"✅ INGEST: Completed - {result}")
     
     return result
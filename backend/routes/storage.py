@@ -164,6 +164,18 @@ def clear_all_storage_and_index():
                 total_destroyed += file_count
                 print(f"💥 NUCLEAR: Destroyed {storage_type} storage - {file_count} files")
         
+        # Step 3b: Drop parsed-document, outline, section and persona caches (derived from the destroyed PDFs)
+        from services.document_cache import get_document_cache
+        from services.outline_cache import get_outline_cache
+        from services.section_cache import get_section_cache
+        from services.persona_cache import get_persona_cache
+        parsed_removed = get_document_cache().clear()
+        outlines_removed = get_outline_cache().clear()
+        sections_removed = get_section_cache().clear()
+        personas_removed = get_persona_cache().clear()
+        print(f"💥 NUCLEAR: Destroyed {parsed_removed} parsed document, {outlines_removed} outline, "
+              f"{sections_removed} section and {personas_removed} persona cache files")
+        
         # Step 4: Reset global index cache
         print("🧠 NUCLEAR: Destroying global index cache...")
         from services.semantic_index import reset_global_index
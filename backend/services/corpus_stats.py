@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+from typing import Optional
+
+from sparse_tfidf import DocumentFrequencies
+
+
+STORE_DIR = os.environ.get("STORE_DIR", os.path.abspath("./store"))
+# Lives next to the semantic index it describes and is cleared with it
+CORPUS_STATS_PATH = os.path.join(STORE_DIR, "semantic_index", "corpus_stats.json")
+
+
+def load_corpus_stats(path: str = CORPUS_STATS_PATH) -> Optional[DocumentFrequencies]:
+    """Persisted document frequencies, or None when there are none (or they are unreadable)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return DocumentFrequencies.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️  Discarding unreadable corpus statistics {path}: {e}")
+        return None
+
+
+def save_corpus_stats(frequencies: DocumentFrequencies, path: str = CORPUS_STATS_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(frequencies.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"⚠️  Could not persist corpus statistics: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+# Global singleton
+_GLOBAL_CORPUS_STATS: Optional[DocumentFrequencies] = None
+
+
+def get_corpus_stats() -> DocumentFrequencies:
+    """Term document frequencies of the ingested corpus.
+
+    Maintained by the semantic index on ingest and removal; readers such as
+    persona scoring do not need the index (or its embedding model) loaded.
+    """
+    global _GLOBAL_CORPUS_STATS
+    if _GLOBAL_CORPUS_STATS is None:
+        _GLOBAL_CORPUS_STATS = load_corpus_stats() or DocumentFrequencies()
+    return _GLOBAL_CORPUS_STATS
+
+
+def set_corpus_stats(frequencies: DocumentFrequencies) -> None:
+    global _GLOBAL_CORPUS_STATS
+    _GLOBAL_CORPUS_STATS = frequencies
+
+
+def reset_corpus_stats() -> None:
+    """Forget the in-memory statistics; the next get_corpus_stats() reloads from disk."""
+    global _GLOBAL_CORPUS_STATS
+    _GLOBAL_CORPUS_STATS = None
@@ -0,0 +1,148 @@
+import gzip
+import json
+import os
+import threading
+from typing import Any, List, Optional, Tuple
+
+
+class DiskCache:
+    """Directory of JSON entries, bounded in size with least-recently-used eviction.
+
+    Entries are written atomically (temp file + os.replace) and gzipped when
+    the suffix ends in ".gz"; reads touch the file so its mtime tracks use.
+    The directory is sized once and a running total is kept from then on, so
+    writes only list the directory when they have to evict. Other processes
+    writing to the same directory are noticed at that point, when the total
+    is recounted. max_bytes <= 0 disables the bound.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 0, suffix: str = ".json.gz", label: str = "CACHE") -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.label = label
+        self._compressed = suffix.endswith(".gz")
+        self._total: Optional[int] = None
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}{self.suffix}")
+
+    def read(self, name: str) -> Optional[Any]:
+        """Entry name, or None when it is missing (unreadable entries are discarded)"""
+        path = self.path(name)
+        try:
+            with self._open(path, "r") as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"⚠️  Discarding unreadable {self.label.lower()} entry {path}: {e}")
+            self.remove(name)
+            return None
+        try:
+            # Touch on hit so eviction is least-recently-used
+            os.utime(path, None)
+        except OSError:
+            pass
+        return payload
+
+    def write(self, name: str, payload: Any) -> bool:
+        """Store payload as entry name; returns False (after logging) if it could not be written"""
+        path = self.path(name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with self._open(tmp_path, "w") as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            size = os.path.getsize(tmp_path)
+            replaced = _size(path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️  Could not persist {self.label.lower()} entry {name}: {e}")
+            _remove(tmp_path)
+            return False
+        with self._lock:
+            if self._total is not None:
+                self._total += size - replaced
+        self._evict()
+        return True
+
+    def remove(self, name: str) -> bool:
+        return self._remove_path(self.path(name))
+
+    def remove_prefix(self, prefix: str) -> int:
+        """Remove every entry whose name starts with prefix; returns entries removed"""
+        return sum(self._remove_path(os.path.join(self.directory, n)) for n in self._entries() if n.startswith(prefix))
+
+    def clear(self) -> int:
+        removed = sum(self._remove_path(os.path.join(self.directory, n)) for n in self._entries())
+        with self._lock:
+            self._total = None
+        return removed
+
+    def _open(self, path: str, mode: str):
+        if self._compressed:
+            return gzip.open(path, f"{mode}t", encoding="utf-8", compresslevel=5)
+        return open(path, mode, encoding="utf-8")
+
+    def _entries(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [n for n in os.listdir(self.directory) if n.endswith(self.suffix)]
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every entry"""
+        entries = []
+        for name in self._entries():
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _remove_path(self, path: str) -> bool:
+        size = _size(path)
+        if not _remove(path):
+            return False
+        with self._lock:
+            if self._total is not None:
+                self._total -= size
+        return True
+
+    def _evict(self) -> None:
+        if self.max_bytes <= 0:
+            return
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._scan())
+            if self._total <= self.max_bytes:
+                return
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            # Evict down to 90% of the bound so the next writes do not rescan right away
+            target = self.max_bytes * 9 // 10
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                if _remove(path):
+                    total -= size
+                    print(f"🧹 {self.label}: Evicted {os.path.basename(path)}")
+            self._total = total
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
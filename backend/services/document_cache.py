@@ -0,0 +1,100 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from parsed_document import ParsedDocument, parse_pdf, PARSED_DOCUMENT_VERSION
+from .disk_cache import DiskCache
+from .storage_service import _sha1
+
+
+STORE_DIR = os.environ.get("STORE_DIR", os.path.abspath("./store"))
+PARSED_DOC_DIR = os.path.join(STORE_DIR, "parsed_documents")
+PARSED_DOC_CACHE_MAX_BYTES = int(os.environ.get("PARSED_DOC_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+os.makedirs(PARSED_DOC_DIR, exist_ok=True)
+
+
+class ParsedDocumentCache:
+    """Parsed documents keyed by storage doc id.
+
+    Each document is parsed once, persisted as gzipped compact JSON under
+    STORE_DIR, and kept in a small in-memory LRU for back-to-back requests.
+    When the directory exceeds max_bytes the least recently used documents
+    are evicted from disk.
+    """
+
+    def __init__(self, directory: str = PARSED_DOC_DIR, max_bytes: int = PARSED_DOC_CACHE_MAX_BYTES,
+                 max_memory_items: int = 8) -> None:
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, ParsedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = DiskCache(directory, max_bytes, label="DOCUMENT CACHE")
+
+    def _remember(self, parsed: ParsedDocument) -> None:
+        with self._lock:
+            self._memory[parsed.doc_id] = parsed
+            self._memory.move_to_end(parsed.doc_id)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def _load_from_disk(self, doc_id: str) -> Optional[ParsedDocument]:
+        data = self._store.read(doc_id)
+        if data is None:
+            return None
+        try:
+            parsed = ParsedDocument.from_dict(data)
+        except Exception as e:
+            print(f"⚠️  Could not read parsed document {doc_id}, re-parsing: {e}")
+            return None
+        if parsed.version != PARSED_DOCUMENT_VERSION:
+            return None
+        return parsed
+
+    def get(self, pdf_path: str, doc_id: Optional[str] = None) -> ParsedDocument:
+        """Return the parsed document for pdf_path, parsing it only on a miss."""
+        if not doc_id:
+            doc_id = _sha1(pdf_path)
+
+        with self._lock:
+            parsed = self._memory.get(doc_id)
+            if parsed is not None:
+                self._memory.move_to_end(doc_id)
+                return parsed
+
+        parsed = self._load_from_disk(doc_id)
+        if parsed is None:
+            print(f"📖 PARSE: Parsing {os.path.basename(pdf_path)} ({doc_id})")
+            parsed = parse_pdf(pdf_path, doc_id)
+            self.save(parsed)
+        self._remember(parsed)
+        return parsed
+
+    def save(self, parsed: ParsedDocument) -> None:
+        """Persist parsed (e.g. after a lazily computed facet was attached)."""
+        self._store.write(parsed.doc_id, parsed.to_dict())
+
+    def invalidate(self, doc_id: str) -> None:
+        with self._lock:
+            self._memory.pop(doc_id, None)
+        self._store.remove(doc_id)
+
+    def clear(self) -> int:
+        """Drop every parsed document from memory and disk; returns files removed."""
+        with self._lock:
+            self._memory.clear()
+        return self._store.clear()
+
+
+# Global singleton
+_GLOBAL_DOCUMENT_CACHE: Optional[ParsedDocumentCache] = None
+
+
+def get_document_cache() -> ParsedDocumentCache:
+    global _GLOBAL_DOCUMENT_CACHE
+    if _GLOBAL_DOCUMENT_CACHE is None:
+        _GLOBAL_DOCUMENT_CACHE = ParsedDocumentCache()
+    return _GLOBAL_DOCUMENT_CACHE
+
+
+def get_parsed_document(pdf_path: str, doc_id: Optional[str] = None) -> ParsedDocument:
+    return get_document_cache().get(pdf_path, doc_id)
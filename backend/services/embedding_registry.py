@@ -0,0 +1,113 @@
+import os
+import threading
+from typing import Optional
+
+try:
+    from fastembed import TextEmbedding
+except Exception:
+    TextEmbedding = None  # type: ignore
+
+
+STORE_DIR = os.environ.get("STORE_DIR", os.path.abspath("./store"))
+# Model weights live outside the semantic index directory so that index
+# resets and storage clears never force a re-download of the ONNX model.
+EMBEDDING_CACHE_DIR = os.environ.get(
+    "EMBEDDING_CACHE_DIR", os.path.join(STORE_DIR, "embedding_models")
+)
+EMBEDDING_MODEL_NAME = os.environ.get("EMBEDDING_MODEL_NAME", "BAAI/bge-small-en-v1.5")
+DEFAULT_VECTOR_DIM = 384
+
+
+class EmbeddingModelRegistry:
+    """Process-wide holder for the loaded fastembed model.
+
+    The registry owns the model lifecycle independently of ``SemanticIndex``,
+    so dropping or rebuilding the index keeps the loaded model resident.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, cache_dir: str = EMBEDDING_CACHE_DIR) -> None:
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self._model = None
+        self._vector_dim = DEFAULT_VECTOR_DIM
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get_model(self):
+        """Return the loaded model, loading it on first use (None if unavailable)."""
+        if self._loaded:
+            return self._model
+        with self._lock:
+            if not self._loaded:
+                self._model = self._load_model()
+                self._vector_dim = self._probe_dimension(self._model)
+                self._loaded = True
+        return self._model
+
+    def vector_dim(self) -> int:
+        self.get_model()
+        return self._vector_dim
+
+    def is_loaded(self) -> bool:
+        return self._loaded and self._model is not None
+
+    def unload(self) -> None:
+        """Drop the in-memory model; weights on disk are kept for the next load."""
+        with self._lock:
+            self._model = None
+            self._vector_dim = DEFAULT_VECTOR_DIM
+            self._loaded = False
+
+    def _load_model(self):
+        if TextEmbedding is None:
+            print("No embedding model available, using fallback")
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            model = TextEmbedding(
+                model_name=self.model_name,
+                max_length=512,
+                cache_dir=self.cache_dir,
+            )
+            print(f"Using enhanced BGE embedding model for better accuracy (cache: {self.cache_dir})")
+            return model
+        except Exception as e:
+            print(f"Could not load BGE model: {e}")
+        try:
+            model = TextEmbedding(cache_dir=self.cache_dir)
+            print("Using default fastembed model")
+            return model
+        except Exception:
+            print("No embedding model available, using fallback")
+            return None
+
+    @staticmethod
+    def _probe_dimension(model) -> int:
+        if model is None:
+            return DEFAULT_VECTOR_DIM
+        try:
+            test_emb = list(model.embed(["test"]))
+            dim = len(test_emb[0])
+            print(f"Embedding model dimension: {dim}")
+            return dim
+        except Exception:
+            return DEFAULT_VECTOR_DIM
+
+
+# Global singleton
+_GLOBAL_REGISTRY: Optional[EmbeddingModelRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_embedding_registry() -> EmbeddingModelRegistry:
+    global _GLOBAL_REGISTRY
+    if _GLOBAL_REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _GLOBAL_REGISTRY is None:
+                _GLOBAL_REGISTRY = EmbeddingModelRegistry()
+    return _GLOBAL_REGISTRY
+
+
+def get_embedding_model():
+    """Shortcut for the shared model instance (None when fastembed is unavailable)."""
+    return get_embedding_registry().get_model()
@@ -0,0 +1,79 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from .disk_cache import DiskCache
+
+
+STORE_DIR = os.environ.get("STORE_DIR", os.path.abspath("./store"))
+OUTLINE_CACHE_DIR = os.path.join(STORE_DIR, "outline_cache")
+OUTLINE_CACHE_MAX_BYTES = int(os.environ.get("OUTLINE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+os.makedirs(OUTLINE_CACHE_DIR, exist_ok=True)
+
+
+class OutlineCache:
+    """Extracted outlines keyed by document sha1 plus extractor version.
+
+    Outlines are small, so each is a plain JSON file under STORE_DIR with an
+    in-memory LRU in front for repeated viewer requests. When the directory
+    exceeds max_bytes the least recently used files are evicted.
+    """
+
+    def __init__(self, directory: str = OUTLINE_CACHE_DIR, max_bytes: int = OUTLINE_CACHE_MAX_BYTES,
+                 max_memory_items: int = 256) -> None:
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._store = DiskCache(directory, max_bytes, suffix=".json", label="OUTLINE CACHE")
+
+    def _remember(self, key: str, outline: dict) -> None:
+        with self._lock:
+            self._memory[key] = outline
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, doc_id: str, version: str) -> Optional[dict]:
+        key = f"{doc_id}_{version}"
+        with self._lock:
+            outline = self._memory.get(key)
+            if outline is not None:
+                self._memory.move_to_end(key)
+                return copy.deepcopy(outline)
+
+        outline = self._store.read(key)
+        if outline is None:
+            return None
+        self._remember(key, outline)
+        return copy.deepcopy(outline)
+
+    def put(self, doc_id: str, version: str, outline: dict) -> None:
+        key = f"{doc_id}_{version}"
+        self._remember(key, copy.deepcopy(outline))
+        self._store.write(key, outline)
+
+    def invalidate(self, doc_id: str) -> None:
+        """Remove every version cached for doc_id."""
+        prefix = f"{doc_id}_"
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                del self._memory[key]
+        self._store.remove_prefix(prefix)
+
+    def clear(self) -> int:
+        with self._lock:
+            self._memory.clear()
+        return self._store.clear()
+
+
+# Global singleton
+_GLOBAL_OUTLINE_CACHE: Optional[OutlineCache] = None
+
+
+def get_outline_cache() -> OutlineCache:
+    global _GLOBAL_OUTLINE_CACHE
+    if _GLOBAL_OUTLINE_CACHE is None:
+        _GLOBAL_OUTLINE_CACHE = OutlineCache()
+    return _GLOBAL_OUTLINE_CACHE
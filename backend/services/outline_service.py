@@ -1,10 +1,17 @@
-from process_pdfs import OutlineExtractor
-from typing import List, Optional
+import os
+from process_pdfs import get_outline_extractor, DEFAULT_LAYOUT_BACKEND, OUTLINE_EXTRACTOR_VERSION, USE_EMBEDDED_TOC
+from typing import List, Optional, Tuple
+from .document_cache import get_document_cache
+from .outline_cache import get_outline_cache
+from .section_cache import get_section_cache
+from .sandbox import get_sandbox, SandboxError
 from .storage_service import (
     save_and_get_docid as storage_save_and_get_docid,
+    save_upload_and_get_docid as storage_save_upload_and_get_docid,
     get_pdf_path as storage_get_pdf_path,
     delete_file_by_docid,
-    StorageType
+    StorageType,
+    _sha1,
 )
 
 
@@ -18,14 +25,79 @@ def save_and_get_docid(
     return storage_save_and_get_docid(temp_path, original_filename, storage_type)
 
 
+async def save_upload_and_get_docid(
+    upload,
+    original_filename: str | None = None,
+    storage_type: StorageType = "fresh"
+) -> Tuple[str, str]:
+    """Stream an upload into the store; returns (doc_id, stored path)"""
+    return await storage_save_upload_and_get_docid(upload, original_filename, storage_type)
+
+
 def get_pdf_path(doc_id: str, storage_type: Optional[StorageType] = None) -> str:
     """Get PDF path using the new storage service"""
     return storage_get_pdf_path(doc_id, storage_type)
 
 
-def extract_outline_from_file(path: str) -> dict:
-    extractor = OutlineExtractor()
-    return extractor.extract_outline(path)
+def extract_outline_from_file(path: str, doc_id: Optional[str] = None, backend: Optional[str] = None) -> dict:
+    """Return the document's outline, extracting it in a sandbox worker on a cache miss.
+    
+    Outlines are memoized by doc sha1, extractor version, layout backend and
+    whether embedded TOCs are used (OUTLINE_USE_EMBEDDED_TOC). backend selects
+    the layout engine ("pdfminer" or "pymupdf"); None uses the
+    OUTLINE_LAYOUT_BACKEND default. A document that crashes or exceeds the
+    sandbox limits gets an empty outline, which is not cached.
+    """
+    if not doc_id:
+        doc_id = _sha1(path)
+    version = f"v{OUTLINE_EXTRACTOR_VERSION}-{backend or DEFAULT_LAYOUT_BACKEND}-toc{int(USE_EMBEDDED_TOC)}"
+    cache = get_outline_cache()
+    cached = cache.get(doc_id, version)
+    if cached is not None:
+        return cached
+    
+    try:
+        result = get_sandbox().run(_extract_outline_job, path, doc_id, backend)
+    except SandboxError as e:
+        print(f"❌ SANDBOX: {e}; using empty outline")
+        return {"title": "", "outline": []}
+    cache.put(doc_id, version, result)
+    return result
+
+
+def _extract_outline_job(path: str, doc_id: Optional[str], backend: Optional[str]) -> dict:
+    """Sandbox entry point: extract the outline, parsing (or loading) the document only for layout analysis"""
+    extractor = get_outline_extractor()
+    result = extractor.embedded_toc_outline(path)
+    if result is not None:
+        return result
+    
+    cache = get_document_cache()
+    parsed = cache.get(path, doc_id)
+    had_layout = parsed.layout_blocks is not None
+    
+    result = extractor.extract_outline(path, parsed, backend, use_toc=False)
+    
+    if not had_layout and parsed.layout_blocks is not None:
+        cache.save(parsed)
+    return result
+
+
+def invalidate_document_caches(doc_id: str) -> None:
+    """Drop every derived artifact of a deleted document, including its index sections"""
+    # Uploads are content-addressed, so another storage type may still hold this
+    # document; without a storage type get_pdf_path searches all of them
+    if os.path.exists(storage_get_pdf_path(doc_id)):
+        return
+    get_document_cache().invalidate(doc_id)
+    get_outline_cache().invalidate(doc_id)
+    get_section_cache().invalidate(doc_id)
+    # Imported here: the semantic index itself builds on this module
+    from .semantic_index import get_loaded_index
+    # An index nobody loaded yet is not worth loading the embedding model for
+    index = get_loaded_index()
+    if index is not None:
+        index.remove_documents([doc_id])
 
 
 def delete_docs_by_ids(doc_ids: List[str]) -> dict:
@@ -35,6 +107,7 @@ def delete_docs_by_ids(doc_ids: List[str]) -> dict:
         # Try to delete from all storage types
         deleted = delete_file_by_docid(did)
         if deleted:
+            invalidate_document_caches(did)
             removed.append(did)
     return {"removed": removed}
 
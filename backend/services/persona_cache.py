@@ -0,0 +1,58 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+from .disk_cache import DiskCache
+
+
+STORE_DIR = os.environ.get("STORE_DIR", os.path.abspath("./store"))
+PERSONA_CACHE_DIR = os.path.join(STORE_DIR, "persona_cache")
+PERSONA_CACHE_MAX_BYTES = int(os.environ.get("PERSONA_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+os.makedirs(PERSONA_CACHE_DIR, exist_ok=True)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def persona_cache_key(persona: str, job: str, doc_ids: List[str], version: str) -> str:
+    """Key of a persona analysis: normalized persona and job, the document set and a version
+    covering everything else the result depends on (analyzer, parser, corpus statistics)"""
+    payload = json.dumps([_normalize(persona), _normalize(job), sorted(set(doc_ids)), version],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class PersonaCache:
+    """Disk cache of persona analysis results.
+
+    Entries are keyed by persona_cache_key and remember the filename each
+    document had, so a hit can be reported under the filenames of the
+    current request. When the directory exceeds max_bytes the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, directory: str = PERSONA_CACHE_DIR, max_bytes: int = PERSONA_CACHE_MAX_BYTES) -> None:
+        self._store = DiskCache(directory, max_bytes, label="PERSONA CACHE")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Cached entry: {"documents": {doc_id: filename}, "result": result}"""
+        return self._store.read(key)
+
+    def put(self, key: str, documents: Dict[str, str], result: Dict) -> None:
+        self._store.write(key, {"documents": documents, "result": result})
+
+    def clear(self) -> int:
+        return self._store.clear()
+
+
+# Global singleton
+_GLOBAL_PERSONA_CACHE: Optional[PersonaCache] = None
+
+
+def get_persona_cache() -> PersonaCache:
+    global _GLOBAL_PERSONA_CACHE
+    if _GLOBAL_PERSONA_CACHE is None:
+        _GLOBAL_PERSONA_CACHE = PersonaCache()
+    return _GLOBAL_PERSONA_CACHE
@@ -1,9 +1,131 @@
-from typing import List
-from persona_analyzer import FontBasedGenericAnalyzer
+import os
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from parsed_document import PARSED_DOCUMENT_VERSION
+from persona_analyzer import FontBasedGenericAnalyzer, DocumentSection, PERSONA_ANALYZER_VERSION
+from .corpus_stats import get_corpus_stats
+from .document_cache import get_parsed_document
+from .persona_cache import get_persona_cache, persona_cache_key
+from .sandbox import get_sandbox
+from .semantic_index import get_index
+from .storage_service import _sha1
+
+
+PERSONA_CACHE_VERSION = f"v{PERSONA_ANALYZER_VERSION}-p{PARSED_DOCUMENT_VERSION}"
 
 
 def analyze_persona(persona: str, job: str, input_paths: List[str]) -> dict:
-    analyzer = FontBasedGenericAnalyzer()
-    return analyzer.analyze_documents(input_paths, persona, job)
+    """Persona analysis of PDFs, parsing (or loading the cached parse of) each one.
+    
+    Results are memoized by persona, job, document contents and the corpus
+    statistics their scores depend on. On a miss, per-document extraction
+    runs in the sandbox workers, which load parsed documents from the shared
+    cache; a document that crashes or exceeds the sandbox limits is skipped
+    (and the result is not cached). Scoring and ranking happen here.
+    """
+    documents, key, cached = _cached_persona_result(persona, job, input_paths)
+    if cached is not None:
+        return cached
+    
+    analyzer = _parsing_analyzer()
+    result = analyzer.analyze_documents(input_paths, persona, job)
+    if not analyzer.failed_documents:
+        get_persona_cache().put(key, documents, result)
+    return result
+
+
+def stream_persona(persona: str, job: str, input_paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """analyze_persona as a stream of progress events.
+    
+    Emits a "start" event, then a "document" event with provisional top
+    sections as each document finishes, then the "result" event (see
+    FontBasedGenericAnalyzer.iter_analysis). A cached result is sent as the
+    only event.
+    """
+    documents, key, cached = _cached_persona_result(persona, job, input_paths)
+    if cached is not None:
+        yield {"event": "result", "cached": True, "result": cached}
+        return
+    
+    yield {"event": "start", "total": len(input_paths),
+           "documents": [os.path.basename(path) for path in input_paths]}
+    analyzer = _parsing_analyzer()
+    for event in analyzer.iter_analysis(input_paths, persona, job):
+        if event["event"] == "result" and not analyzer.failed_documents:
+            get_persona_cache().put(key, documents, event["result"])
+        yield event
+
+
+def _parsing_analyzer() -> FontBasedGenericAnalyzer:
+    return FontBasedGenericAnalyzer(document_loader=get_parsed_document,
+                                    document_frequencies=get_corpus_stats(),
+                                    executor=get_sandbox())
+
+
+def _cached_persona_result(persona: str, job: str,
+                           input_paths: List[str]) -> Tuple[Dict[str, str], str, Optional[dict]]:
+    """({doc_id: filename}, cache key, cached result or None) of a persona request"""
+    start = time.perf_counter()
+    documents = {_sha1(path): os.path.basename(path) for path in input_paths}
+    # Scores depend on corpus IDF, so results go stale when documents are ingested or removed
+    version = f"{PERSONA_CACHE_VERSION}-c{get_corpus_stats().fingerprint()}"
+    key = persona_cache_key(persona, job, list(documents), version)
+    entry = get_persona_cache().get(key)
+    if entry is None:
+        return documents, key, None
+    result = _reuse_cached_result(entry, documents, input_paths, persona, job)
+    print(f"⚡ PERSONA: Cache hit for {len(documents)} document(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return documents, key, result
+
+
+def _reuse_cached_result(entry: dict, documents: Dict[str, str], input_paths: List[str],
+                         persona: str, job: str) -> dict:
+    """A cached result under this request's filenames, with a fresh timestamp"""
+    result = entry["result"]
+    # The same contents may have been analyzed under other stored filenames
+    renamed = {entry["documents"].get(doc_id): filename for doc_id, filename in documents.items()}
+    for item in chain(result.get("extracted_sections", []), result.get("subsection_analysis", [])):
+        item["document"] = renamed.get(item["document"], item["document"])
+    metadata = result["metadata"]
+    metadata["input_documents"] = [os.path.basename(path) for path in input_paths]
+    metadata["persona"] = persona
+    metadata["job_to_be_done"] = job
+    metadata["processing_timestamp"] = datetime.now().isoformat()
+    return result
 
 
+def analyze_persona_indexed(persona: str, job: str, doc_filenames: Dict[str, str]) -> Optional[dict]:
+    """Persona analysis over the semantic index for already-ingested documents.
+    
+    doc_filenames maps each requested doc_id to the filename reported in
+    the result. Returns None when any document has no indexed sections, so
+    the caller can fall back to parsing the PDFs.
+    """
+    start = time.perf_counter()
+    index = get_index()
+    analyzer = FontBasedGenericAnalyzer(document_frequencies=index.frequencies)
+    query_text = f"{analyzer.extract_string_value(persona)}. {analyzer.extract_string_value(job)}"
+    
+    indexed, sims, baseline = index.doc_similarities(query_text, list(doc_filenames))
+    missing = set(doc_filenames) - {s.doc_id for s in indexed}
+    if missing:
+        print(f"ℹ️  PERSONA: {len(missing)} document(s) not indexed, parsing instead")
+        return None
+    
+    sections = [
+        DocumentSection(
+            document=doc_filenames[s.doc_id],
+            page_number=s.page,
+            section_title=s.title,
+            content=f"{s.title}\n\n{s.text}",
+            importance_rank=0,
+            section_id=s.section_id,
+            relevance_score=0.0
+        )
+        for s in indexed
+    ]
+    result = analyzer.analyze_indexed_sections(sections, sims, baseline, list(doc_filenames.values()), persona, job)
+    print(f"⚡ PERSONA: Analyzed {len(sections)} indexed sections in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return result
@@ -0,0 +1,292 @@
+import atexit
+import multiprocessing
+import multiprocessing.util  # registers its exit handler before ours (see bottom)
+import os
+import queue
+import signal
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore
+
+
+# Worker processes that run all PDF parsing on behalf of the API
+# (INGEST_WORKERS is honored for backwards compatibility)
+SANDBOX_WORKERS = int(os.environ.get(
+    "SANDBOX_WORKERS",
+    os.environ.get("INGEST_WORKERS", str(max(2, min(4, os.cpu_count() or 1)))),
+))
+# Per-document limits; 0 disables a limit
+SANDBOX_TIMEOUT = float(os.environ.get("SANDBOX_TIMEOUT", "120"))
+SANDBOX_CPU_SECONDS = int(os.environ.get("SANDBOX_CPU_SECONDS", "120"))
+SANDBOX_MEMORY_MB = int(os.environ.get("SANDBOX_MEMORY_MB", "2048"))
+# Workers are replaced after this many jobs to release fragmented memory
+SANDBOX_MAX_JOBS = int(os.environ.get("SANDBOX_MAX_JOBS", "50"))
+# Seconds a job may wait for a free worker before failing; 0 waits forever
+SANDBOX_ACQUIRE_TIMEOUT = float(os.environ.get("SANDBOX_ACQUIRE_TIMEOUT", "30"))
+
+# True inside a sandbox worker, where nested sandboxed calls run directly
+_IN_SANDBOX = False
+
+# Every live pool, so idle workers can be stopped at interpreter exit
+_POOLS: "weakref.WeakSet[SandboxPool]" = weakref.WeakSet()
+
+
+class SandboxError(RuntimeError):
+    """A sandboxed job failed, crashed its worker or ran out of time."""
+
+
+def _apply_memory_limit(memory_mb: int) -> None:
+    if resource is None or memory_mb <= 0:
+        return
+    limit = memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        print(f"⚠️  SANDBOX: Could not set memory limit: {e}")
+
+
+def _arm_cpu_limit(cpu_seconds: int) -> None:
+    """Allow cpu_seconds more CPU time from now (SIGXCPU kills the worker past it)"""
+    if resource is None or cpu_seconds <= 0:
+        return
+    used = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(used.ru_utime + used.ru_stime) + cpu_seconds
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    except (ValueError, OSError) as e:
+        print(f"⚠️  SANDBOX: Could not set CPU limit: {e}")
+
+
+def _worker_main(conn, memory_mb: int, cpu_seconds: int) -> None:
+    """Sandbox worker loop: run (fn, args, kwargs) jobs until the pipe closes"""
+    global _IN_SANDBOX
+    _IN_SANDBOX = True
+    if hasattr(os, "setsid"):
+        # Own process group, so kill() also takes down anything the job started
+        os.setsid()
+    _apply_memory_limit(memory_mb)
+    while True:
+        try:
+            fn, args, kwargs = conn.recv()
+        except (EOFError, OSError):
+            break
+        _arm_cpu_limit(cpu_seconds)
+        try:
+            reply = (True, fn(*args, **kwargs))
+        except MemoryError:
+            reply = (False, "memory limit exceeded")
+        except Exception as e:
+            reply = (False, f"{type(e).__name__}: {e}")
+        try:
+            conn.send(reply)
+        except MemoryError:
+            conn.send((False, "memory limit exceeded"))
+
+
+class _Worker:
+    def __init__(self, ctx, memory_mb: int, cpu_seconds: int) -> None:
+        self.conn, child_conn = ctx.Pipe()
+        # Jobs run serially here (page_workers_available() is False in workers)
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_mb, cpu_seconds),
+                                   name="pdf-sandbox")
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def kill(self) -> None:
+        try:
+            if hasattr(os, "killpg") and self.process.pid is not None:
+                try:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    # Exited, or has not made its own group yet
+                    self.process.kill()
+            else:
+                self.process.kill()
+            self.process.join(timeout=5)
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class SandboxPool:
+    """Recyclable worker subprocesses for untrusted PDF parsing.
+
+    Each worker runs under RLIMIT_AS and a per-job RLIMIT_CPU budget, and
+    every job has a wall-clock timeout. A worker that crashes, times out or
+    exceeds a limit is killed together with its process group and replaced;
+    the caller gets SandboxError (or its fallback) while the API process
+    itself stays unaffected.
+
+    Background jobs (submit, run_background) may occupy at most workers - 1
+    workers, keeping one free for interactive run() calls such as outline
+    requests; a pool therefore has at least two workers. A job that cannot
+    get a worker within acquire_timeout seconds fails with SandboxError.
+    """
+
+    def __init__(self, workers: int = SANDBOX_WORKERS, timeout: float = SANDBOX_TIMEOUT,
+                 cpu_seconds: int = SANDBOX_CPU_SECONDS, memory_mb: int = SANDBOX_MEMORY_MB,
+                 max_jobs: int = SANDBOX_MAX_JOBS, acquire_timeout: float = SANDBOX_ACQUIRE_TIMEOUT) -> None:
+        # One worker is reserved for interactive jobs, so background jobs need a second
+        self.workers = max(2, workers)
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_jobs = max_jobs
+        self.acquire_timeout = acquire_timeout
+        self._background_slots = threading.BoundedSemaphore(self.workers - 1)
+        # Spawned, not forked: forking a threaded server is unsafe
+        self._ctx = multiprocessing.get_context("spawn")
+        # None marks a free slot whose worker was retired and is not yet replaced
+        self._idle: "queue.LifoQueue[Optional[_Worker]]" = queue.LifoQueue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        _POOLS.add(self)
+
+    def _acquire(self) -> _Worker:
+        try:
+            worker = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_start = self._started < self.workers
+                if can_start:
+                    self._started += 1
+            if can_start:
+                worker = None
+            else:
+                try:
+                    worker = self._idle.get(timeout=self.acquire_timeout if self.acquire_timeout > 0 else None)
+                except queue.Empty:
+                    raise SandboxError(f"all {self.workers} sandbox workers stayed busy for "
+                                       f"{self.acquire_timeout:g}s") from None
+        if worker is not None:
+            return worker
+        # Workers start in the thread that needs one, not in the one that retired a worker
+        try:
+            return _Worker(self._ctx, self.memory_mb, self.cpu_seconds)
+        except Exception:
+            with self._lock:
+                self._started -= 1
+            raise
+
+    def _release(self, worker: _Worker, healthy: bool) -> None:
+        if healthy and (self.max_jobs <= 0 or worker.jobs < self.max_jobs):
+            self._idle.put(worker)
+            return
+        worker.kill()
+        # Hand the slot on, waking a caller blocked on the idle queue to start its replacement
+        self._idle.put(None)
+
+    def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """Run module-level fn(*args, **kwargs) in a worker; raises SandboxError on failure"""
+        if _IN_SANDBOX:
+            return fn(*args, **kwargs)
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            worker = self._acquire()
+        except SandboxError as e:
+            raise SandboxError(f"{fn.__name__} could not start: {e}") from None
+        healthy = False
+        start = time.monotonic()
+        try:
+            worker.jobs += 1
+            worker.conn.send((fn, args, kwargs))
+            if not worker.conn.poll(timeout if timeout > 0 else None):
+                raise SandboxError(f"{fn.__name__} timed out after {timeout:g}s")
+            ok, payload = worker.conn.recv()
+            healthy = True
+        except (EOFError, OSError):
+            worker.process.join(timeout=1)
+            raise SandboxError(f"{fn.__name__} crashed its worker (exit code {worker.process.exitcode})")
+        finally:
+            self._release(worker, healthy)
+        if not ok:
+            raise SandboxError(f"{fn.__name__} failed: {payload}")
+        print(f"🛡️  SANDBOX: {fn.__name__} finished in {time.monotonic() - start:.2f}s")
+        return payload
+
+    def run_or_fallback(self, fn: Callable[..., Any], *args: Any, fallback: Any = None, **kwargs: Any) -> Any:
+        """Like run, but logs the failure and returns fallback instead of raising"""
+        try:
+            return self.run(fn, *args, **kwargs)
+        except SandboxError as e:
+            print(f"❌ SANDBOX: {e}; using fallback result")
+            return fallback() if callable(fallback) else fallback
+
+    def run_background(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """run() for batch work, limited to the background share of the workers"""
+        if _IN_SANDBOX:
+            return fn(*args, **kwargs)
+        with self._background_slots:
+            return self.run(fn, *args, **kwargs)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "Future[Any]":
+        """Schedule run_background(fn, ...) without blocking"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sandbox")
+            executor = self._executor
+        return executor.submit(self.run_background, fn, *args, **kwargs)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.kill()
+        with self._lock:
+            self._started = 0
+
+
+# Global singleton
+_GLOBAL_SANDBOX: Optional[SandboxPool] = None
+_SANDBOX_LOCK = threading.Lock()
+
+
+def get_sandbox() -> SandboxPool:
+    global _GLOBAL_SANDBOX
+    if _GLOBAL_SANDBOX is None:
+        with _SANDBOX_LOCK:
+            if _GLOBAL_SANDBOX is None:
+                _GLOBAL_SANDBOX = SandboxPool()
+    return _GLOBAL_SANDBOX
+
+
+def shutdown_sandbox() -> None:
+    global _GLOBAL_SANDBOX
+    with _SANDBOX_LOCK:
+        if _GLOBAL_SANDBOX is not None:
+            _GLOBAL_SANDBOX.shutdown()
+            _GLOBAL_SANDBOX = None
+
+
+
+def _shutdown_all_pools() -> None:
+    for pool in list(_POOLS):
+        pool.shutdown()
+
+
+# Idle workers block on their pipe, so stop them before multiprocessing's
+# exit handler (registered earlier, hence run later) joins child processes
+atexit.register(_shutdown_all_pools)
@@ -0,0 +1,62 @@
+import os
+from typing import List, Optional, Tuple, Union
+
+from .disk_cache import DiskCache
+
+
+STORE_DIR = os.environ.get("STORE_DIR", os.path.abspath("./store"))
+SECTION_CACHE_DIR = os.path.join(STORE_DIR, "section_cache")
+SECTION_CACHE_MAX_BYTES = int(os.environ.get("SECTION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+os.makedirs(SECTION_CACHE_DIR, exist_ok=True)
+
+Section = Tuple[str, int, str]
+# Entry for a document without usable headings: its fallback chunks are
+# regenerated from the page text on demand instead of being stored
+FALLBACK = "fallback"
+
+
+class SectionCache:
+    """Disk cache of extracted (title, page, content) sections.
+
+    Entries are keyed by document sha1 plus extractor version, so identical
+    files stored under different storage types share one entry. An entry is
+    either the section list or FALLBACK. When the directory exceeds
+    max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory: str = SECTION_CACHE_DIR, max_bytes: int = SECTION_CACHE_MAX_BYTES) -> None:
+        self._store = DiskCache(directory, max_bytes, label="SECTION CACHE")
+
+    def get(self, doc_id: str, version: str) -> Optional[Union[List[Section], str]]:
+        data = self._store.read(f"{doc_id}_{version}")
+        if data is None:
+            return None
+        if data.get("fallback"):
+            return FALLBACK
+        return [(title, page, content) for title, page, content in data.get("sections", [])]
+
+    def put(self, doc_id: str, version: str, sections: Union[List[Section], str]) -> None:
+        entry = {"doc_id": doc_id, "version": version}
+        if sections == FALLBACK:
+            entry["fallback"] = True
+        else:
+            entry["sections"] = [list(s) for s in sections]
+        self._store.write(f"{doc_id}_{version}", entry)
+
+    def invalidate(self, doc_id: str) -> None:
+        """Remove every version cached for doc_id."""
+        self._store.remove_prefix(f"{doc_id}_")
+
+    def clear(self) -> int:
+        return self._store.clear()
+
+
+# Global singleton
+_GLOBAL_SECTION_CACHE: Optional[SectionCache] = None
+
+
+def get_section_cache() -> SectionCache:
+    global _GLOBAL_SECTION_CACHE
+    if _GLOBAL_SECTION_CACHE is None:
+        _GLOBAL_SECTION_CACHE = SectionCache()
+    return _GLOBAL_SECTION_CACHE
@@ -1,22 +1,48 @@
 import os
 import json
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Any, Tuple, Optional
+import threading
+from dataclasses import dataclass, asdict, replace
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Iterable, Callable
 
 import numpy as np
 import fitz  # PyMuPDF
 from collections import defaultdict
 
-try:
-    from fastembed import TextEmbedding
-except Exception:
-    TextEmbedding = None  # type: ignore
+from .corpus_stats import get_corpus_stats, reset_corpus_stats, save_corpus_stats, set_corpus_stats, CORPUS_STATS_PATH
+from .embedding_registry import get_embedding_registry
+from .document_cache import get_parsed_document
+from .outline_service import extract_outline_from_file
+from .section_cache import get_section_cache, FALLBACK
+from .sandbox import get_sandbox, SANDBOX_WORKERS
+from parsed_document import count_pages
+from .storage_service import _sha1, get_storage_type_from_path
+from process_pdfs import DEFAULT_LAYOUT_BACKEND, OUTLINE_EXTRACTOR_VERSION
+from sparse_tfidf import DocumentFrequencies, tokenize
 
 
 STORE_DIR = os.environ.get("STORE_DIR", os.path.abspath("./store"))
 INDEX_DIR = os.path.join(STORE_DIR, "semantic_index")
 os.makedirs(INDEX_DIR, exist_ok=True)
 
+# Ingestion publishes a new index generation every INDEX_PUBLISH_PAGES pages of a
+# document (or every INDEX_EMBED_BATCH sections), so early pages become
+# searchable while the rest of the document is still being embedded
+INDEX_PUBLISH_PAGES = int(os.environ.get("INDEX_PUBLISH_PAGES", "20"))
+INDEX_EMBED_BATCH = int(os.environ.get("INDEX_EMBED_BATCH", "64"))
+
+# Rows (evenly spaced over the index) a query's baseline similarity is taken over
+SIMILARITY_BASELINE_SAMPLE = 4096
+
+# (chunk_size, overlap) in characters for heading-less documents, per storage
+# type; override with FALLBACK_CHUNK_SIZE_<TYPE> / FALLBACK_CHUNK_OVERLAP_<TYPE>
+FALLBACK_CHUNKING = {
+    storage_type: (
+        int(os.environ.get(f"FALLBACK_CHUNK_SIZE_{storage_type.upper()}", "2000")),
+        int(os.environ.get(f"FALLBACK_CHUNK_OVERLAP_{storage_type.upper()}", "200")),
+    )
+    for storage_type in ("bulk", "fresh", "viewer")
+}
+
 
 @dataclass
 class IndexedSection:
@@ -33,6 +59,27 @@ class IndexedSection:
     section_content: str = ""  # Added for structured data requirement
 
 
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """One published generation of the index.
+
+    Snapshots are never mutated: ingestion builds the next generation and
+    swaps it in, so readers holding a snapshot always see sections and
+    vectors that line up.
+    """
+    generation: int
+    sections: List[IndexedSection]
+    vectors: np.ndarray
+
+
+def _document_terms(sections: Iterable[Tuple[str, str]]) -> set:
+    """Distinct terms of a document's (title, text) sections, for corpus statistics"""
+    terms = set()
+    for title, text in sections:
+        terms.update(tokenize(f"{title}\n{text}"))
+    return terms
+
+
 def _split_into_sentences(text: str) -> List[str]:
     """Enhanced sentence splitting with better context preservation"""
     import re
@@ -116,175 +163,273 @@ def _create_semantic_chunks(text: str, chunk_size: int = 512, overlap: int = 100
     return chunks if chunks else [text[:chunk_size]]
 
 
+def _page_texts_job(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Sandbox entry point: plain texts of pages [start, stop), as parse_pdf extracts them"""
+    doc = fitz.open(pdf_path)
+    try:
+        return [doc[i].get_text(flags=fitz.TEXTFLAGS_DICT) for i in range(start, min(stop, len(doc)))]
+    finally:
+        doc.close()
+
+
+def iter_page_texts(pdf_path: str, pages_per_job: int = INDEX_PUBLISH_PAGES) -> Iterator[str]:
+    """Stream plain page texts, pages_per_job pages at a time from a sandbox worker"""
+    sandbox = get_sandbox()
+    page_count = sandbox.run_background(count_pages, pdf_path)
+    step = max(1, pages_per_job)
+    for start in range(0, page_count, step):
+        yield from sandbox.run_background(_page_texts_job, pdf_path, start, start + step)
+
+
+def _check_chunking(chunk_size: int, overlap: int) -> None:
+    if chunk_size <= 0 or not 0 <= overlap < chunk_size:
+        raise ValueError(f"Fallback chunking needs 0 <= overlap < chunk_size (got {chunk_size}, {overlap})")
+
+
+def iter_fallback_chunks(page_texts: Iterable[str], chunk_size: int = 2000,
+                         overlap: int = 200) -> Iterator[Tuple[str, int, str]]:
+    """Lazily turn pages into overlapping (title, page, content) chunks.
+    
+    Only the current page is held, so memory stays bounded by the page size
+    regardless of document length. Raises ValueError unless
+    0 <= overlap < chunk_size.
+    """
+    _check_chunking(chunk_size, overlap)
+    return _fallback_chunks(page_texts, chunk_size, overlap)
+
+
+def _fallback_chunks(page_texts: Iterable[str], chunk_size: int, overlap: int) -> Iterator[Tuple[str, int, str]]:
+    step = chunk_size - overlap
+    for page_num, text in enumerate(page_texts, start=1):
+        if len(text.strip()) < 50:  # Skip very short pages
+            continue
+        
+        if len(text) <= chunk_size:
+            # Single section for short pages
+            yield f"Page {page_num} Content", page_num, text.strip()
+            continue
+        
+        part = 0
+        for start in range(0, len(text), step):
+            chunk = text[start:start + chunk_size].strip()
+            if len(chunk) >= 100:
+                part += 1
+                yield f"Page {page_num} Content (Part {part})", page_num, chunk
+            if start + chunk_size >= len(text):
+                break
+
+
+class FallbackChunks:
+    """Fallback chunks of a heading-less document, produced on iteration.
+    
+    Picklable, so sandbox workers return it in place of the chunk list;
+    iterating streams the page text from sandbox workers a page range at a
+    time, and ingestion embeds the chunks as they arrive.
+    """
+    
+    def __init__(self, pdf_path: str, chunk_size: int, overlap: int) -> None:
+        _check_chunking(chunk_size, overlap)
+        self.pdf_path = pdf_path
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+    
+    def __iter__(self) -> Iterator[Tuple[str, int, str]]:
+        return _fallback_chunks(iter_page_texts(self.pdf_path), self.chunk_size, self.overlap)
+
+
+Sections = Iterable[Tuple[str, int, str]]
+
+
 class EnhancedSectionExtractor:
     """Enhanced section extractor with performance optimizations."""
     
+    # Bump whenever extraction output changes so cached sections are rebuilt
+    VERSION = "3"
+    
+    # Upper bound on a single outline section's raw text (spans pages otherwise)
+    max_section_chars = 4000
+    
     def __init__(self):
-        # Cache for processed PDFs to avoid re-processing
-        self._processed_cache = {}
+        # Persistent content-addressed cache shared across requests
+        self._section_cache = get_section_cache()
         # Batch processing for multiple files
         self._batch_size = 5
     
-    def extract_sections(self, pdf_path: str) -> List[Tuple[str, int, str]]:
-        # Check cache first
-        cache_key = os.path.getmtime(pdf_path)  # Use file modification time as cache key
-        if cache_key in self._processed_cache:
+    @staticmethod
+    def fallback_chunking(pdf_path: str) -> Tuple[int, int]:
+        return FALLBACK_CHUNKING.get(get_storage_type_from_path(pdf_path), FALLBACK_CHUNKING["fresh"])
+    
+    @classmethod
+    def cache_version(cls, pdf_path: str = "") -> str:
+        # The outline extractor, its layout backend and the fallback chunking
+        # change the sections, so they are part of the key
+        chunk_size, overlap = cls.fallback_chunking(pdf_path)
+        return (f"v{cls.VERSION}-o{OUTLINE_EXTRACTOR_VERSION}-{DEFAULT_LAYOUT_BACKEND}"
+                f"-c{chunk_size}o{overlap}")
+    
+    def fallback_chunks(self, pdf_path: str) -> FallbackChunks:
+        return FallbackChunks(pdf_path, *self.fallback_chunking(pdf_path))
+    
+    def get_cached_sections(self, doc_id: str, pdf_path: str = "") -> Optional[Sections]:
+        cached = self._section_cache.get(doc_id, self.cache_version(pdf_path))
+        return self.fallback_chunks(pdf_path) if cached == FALLBACK else cached
+    
+    def extract_sections(self, pdf_path: str, doc_id: Optional[str] = None) -> Sections:
+        """(title, page, content) sections of the PDF.
+        
+        Outline-based sections come back as a list; heading-less documents get
+        FallbackChunks, which produces its chunks lazily when iterated.
+        """
+        # Check cache first (keyed by content hash, so duplicates across storage types hit too)
+        if not doc_id:
+            doc_id = _sha1(pdf_path)
+        version = self.cache_version(pdf_path)
+        cached = self.get_cached_sections(doc_id, pdf_path)
+        if cached is not None:
             print(f"⚡ CACHE HIT: Using cached sections for {os.path.basename(pdf_path)}")
-            return self._processed_cache[cache_key]
+            return cached
         
         print(f"🔍 EXTRACTION: Starting extraction for {os.path.basename(pdf_path)}")
         
         try:
-            from process_pdfs import OutlineExtractor
-            extractor = OutlineExtractor()
-            result = extractor.extract_outline(pdf_path)
+            # Parsed once per document and shared with outline/persona analysis
+            parsed = get_parsed_document(pdf_path, doc_id)
+            result = extract_outline_from_file(pdf_path, doc_id)
             
             outline = result.get("outline", [])
             print(f"📋 EXTRACTION: Found {len(outline)} outline items")
             
-            if not outline:
-                print("⚠️  EXTRACTION: No outline found, using optimized fallback")
-                sections = self._optimized_fallback_extraction(pdf_path)
-            else:
-                sections = self._extract_sections_from_outline(pdf_path, outline)
+            sections = self._extract_sections_from_outline(parsed.page_texts, outline) if outline else []
+            if not sections:
+                # No outline, or e.g. bookmark titles that do not appear verbatim in the page text
+                print("⚠️  EXTRACTION: No usable outline, using streamed fallback chunks")
+                self._section_cache.put(doc_id, version, FALLBACK)
+                return self.fallback_chunks(pdf_path)
             
             # Cache the result
-            self._processed_cache[cache_key] = sections
+            self._section_cache.put(doc_id, version, sections)
             print(f"✅ EXTRACTION: Extracted {len(sections)} sections (cached)")
             return sections
             
         except Exception as e:
             print(f"❌ EXTRACTION: Error with enhanced extraction: {e}")
             print(f"   Falling back to optimized extraction")
-            sections = self._optimized_fallback_extraction(pdf_path)
-            self._processed_cache[cache_key] = sections
-            return sections
+            # Not cached: a later attempt may succeed with the full pipeline
+            return self.fallback_chunks(pdf_path)
     
-    def _extract_sections_from_outline(self, pdf_path: str, outline: list) -> List[Tuple[str, int, str]]:
-        """Optimized outline-based extraction"""
-        import fitz
+    def _extract_sections_from_outline(self, page_texts: List[str], outline: list) -> List[Tuple[str, int, str]]:
+        """Outline-based extraction over a single concatenated page-text buffer.
         
-        doc = fitz.open(pdf_path)
-        sections = []
+        Heading anchors are located in one forward sweep, and each section runs
+        from the line after its heading to the line holding the next anchored
+        heading, across page boundaries if needed.
+        """
+        # Page texts joined once, with the start offset of every page
+        page_offsets = [0]
+        for text in page_texts:
+            page_offsets.append(page_offsets[-1] + len(text))
+        buffer = ''.join(page_texts)
         
-        # Process outline items in parallel batches
-        for i, heading in enumerate(outline):
+        # One sweep: (title, page, heading line start, content start) per anchored heading
+        anchors = []
+        cursor = 0
+        for heading in outline:
             title = heading.get("text", "").strip()
             page = heading.get("page", 1)
+            page_index = page - 1
+            if not title or page_index < 0 or page_index >= len(page_texts):
+                continue
             
-            # Extract content more efficiently
-            content = self._extract_section_content_optimized(doc, heading, outline, i)
-            if content and len(content.strip()) >= 30:  # Reduced minimum length
-                sections.append((title, page, content.strip()))
-        
-        doc.close()
-        return sections
-    
-    def _optimized_fallback_extraction(self, pdf_path: str) -> List[Tuple[str, int, str]]:
-        """Ultra-fast fallback extraction for cooking recipes"""
-        import fitz
-        
-        doc = fitz.open(pdf_path)
-        sections = []
-        
-        # Extract text in larger chunks for speed
-        chunk_size = 2000  # Increased from 1000
-        overlap = 200      # Reduced overlap
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            
-            if len(text.strip()) < 50:  # Skip very short pages
+            pos = buffer.find(title, max(cursor, page_offsets[page_index]), page_offsets[page_index + 1])
+            if pos < 0:
                 continue
             
-            # Create sections based on content length
-            if len(text) > chunk_size:
-                # Split into chunks
-                chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size-overlap)]
-                for i, chunk in enumerate(chunks):
-                    if len(chunk.strip()) >= 100:
-                        title = f"Page {page_num + 1} Content (Part {i+1})"
-                        sections.append((title, page_num + 1, chunk.strip()))
-            else:
-                # Single section for short pages
-                title = f"Page {page_num + 1} Content"
-                sections.append((title, page_num + 1, text.strip()))
+            line_start = buffer.rfind('\n', 0, pos) + 1
+            line_end = buffer.find('\n', pos + len(title))
+            content_start = len(buffer) if line_end < 0 else line_end + 1
+            anchors.append((title, page, line_start, content_start))
+            cursor = content_start
         
-        doc.close()
-        return sections[:10]  # Limit to 10 sections for speed
-    
-    def _extract_section_content_optimized(self, doc: fitz.Document, heading: dict, all_headings: list, current_index: int) -> str:
-        """Optimized content extraction with reduced processing"""
-        current_page = heading.get("page", 1) - 1
-        
-        # Extract content from current page only for speed
-        if current_page < len(doc):
-            page = doc[current_page]
-            text = page.get_text()
-            
-            # Simple content extraction - just get first 500 chars after heading
-            lines = text.split('\n')
-            heading_text = heading.get("text", "").strip()
-            
-            content_started = False
-            content_lines = []
-            
-            for line in lines:
-                if not content_started and heading_text in line:
-                    content_started = True
-                    continue
-                if content_started and line.strip():
-                    content_lines.append(line.strip())
-                    if len('\n'.join(content_lines)) > 500:  # Limit content length
-                        break
+        sections = []
+        for i, (title, page, _, content_start) in enumerate(anchors):
+            content_end = anchors[i + 1][2] if i + 1 < len(anchors) else len(buffer)
+            content_end = min(content_end, content_start + self.max_section_chars)
             
-            return '\n'.join(content_lines[:200])  # Return first 200 chars
+            raw = buffer[content_start:content_end]
+            content = '\n'.join(line.strip() for line in raw.split('\n') if line.strip())
+            if len(content) >= 30:  # Reduced minimum length
+                sections.append((title, page, content))
         
-        return ""
+        return sections
+
+
+def _extract_sections_job(doc_id: str, path: str) -> Sections:
+    """Sandbox entry point: extract one document's (title, page, content) sections"""
+    return EnhancedSectionExtractor().extract_sections(path, doc_id)
+
+
+def iter_sections_parallel(items: List[Tuple[str, str]]) -> Iterator[Tuple[str, str, Optional[Sections]]]:
+    """Yield (doc_id, path, sections) for (doc_id, path) items, in item order.
+    
+    Each document is yielded as soon as it and every document before it are
+    extracted, so callers can index early files while later ones are still
+    in flight. Section-cache hits are served in-process; misses are parsed
+    by the sandbox workers. A file that fails, crashes its worker or exceeds
+    the sandbox limits yields None instead of aborting the whole batch.
+    """
+    extractor = EnhancedSectionExtractor()
+    cached: Dict[int, Sections] = {}
+    
+    misses = []
+    for i, (doc_id, path) in enumerate(items):
+        sections = extractor.get_cached_sections(doc_id, path)
+        if sections is not None:
+            print(f"⚡ CACHE HIT: Using cached sections for {os.path.basename(path)}")
+            cached[i] = sections
+        else:
+            misses.append(i)
+    
+    if misses:
+        print(f"🔄 Extracting {len(misses)} files across {SANDBOX_WORKERS} sandbox workers")
+    sandbox = get_sandbox()
+    futures = {i: sandbox.submit(_extract_sections_job, *items[i]) for i in misses}
+    
+    for i, (doc_id, path) in enumerate(items):
+        if i in cached:
+            yield doc_id, path, cached[i]
+            continue
+        sections = None
+        try:
+            sections = futures[i].result()
+        except Exception as e:
+            print(f"❌ EXTRACTION: Failed for {os.path.basename(path)}: {e}")
+        yield doc_id, path, sections
 
 
 class SemanticIndex:
     def __init__(self) -> None:
         print(f"🔧 Initializing SemanticIndex...")
-        self.embedding = None
-        if TextEmbedding is not None:
-            try:
-                # Use a better embedding model for improved accuracy
-                self.embedding = TextEmbedding(
-                    model_name="BAAI/bge-small-en-v1.5",  # Better model for semantic search
-                    max_length=512,  # Optimal chunk size
-                    cache_dir=os.path.join(INDEX_DIR, "embeddings_cache")
-                )
-                print("Using enhanced BGE embedding model for better accuracy")
-            except Exception as e:
-                print(f"Could not load BGE model: {e}")
-                try:
-                    # Fallback to default model
-                    self.embedding = TextEmbedding()
-                    print("Using default fastembed model")
-                except Exception:
-                    self.embedding = None
-                print("No embedding model available, using fallback")
-
-        # Dynamic vector dimension based on model
-        self.vector_dim = 384  # Default fallback dimension
-        if self.embedding:
-            try:
-                # Test embedding to get actual dimension
-                test_emb = list(self.embedding.embed(["test"]))
-                self.vector_dim = len(test_emb[0])
-                print(f"Embedding model dimension: {self.vector_dim}")
-            except:
-                pass
+        # The model is owned by the process-wide registry so that index
+        # resets do not force a reload of the ONNX weights.
+        registry = get_embedding_registry()
+        self.embedding = registry.get_model()
+        self.vector_dim = registry.vector_dim()
 
-        self.vectors: np.ndarray = np.empty((0, self.vector_dim), dtype=np.float32)
-        self.sections: List[IndexedSection] = []
+        self._snapshot = IndexSnapshot(0, [], np.empty((0, self.vector_dim), dtype=np.float32))
+        # Backing store of the published vectors (see _publish); only the
+        # ingest lock holder writes to it, past the current snapshot's rows
+        self._vector_buffer = self._snapshot.vectors
+        # Serializes ingestion runs; readers never take it
+        self._ingest_lock = threading.Lock()
+        # Set when the global index is reset, so a running ingestion stops
+        # publishing into (and saving) a discarded index
+        self._retired = False
         
         # Load existing data (this is where old data gets loaded!)
         print(f"📂 Loading existing index data...")
         self._load()
         print(f"📊 Loaded {len(self.sections)} sections from disk")
+        self.frequencies = self._load_frequencies()
         
         # Debug: Print some section info to identify old data
         if len(self.sections) > 0:
@@ -292,6 +437,54 @@ class SemanticIndex:
             for i, section in enumerate(self.sections[:3]):
                 print(f"   {i+1}. {section.filename} - {section.title[:50]}...")
 
+    @property
+    def sections(self) -> List[IndexedSection]:
+        return self._snapshot.sections
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._snapshot.vectors
+
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+
+    def snapshot(self) -> IndexSnapshot:
+        """Current published generation; consistent for as long as the caller holds it."""
+        return self._snapshot
+
+    def _set_snapshot(self, snapshot: IndexSnapshot) -> None:
+        """Replace the published generation with one built from scratch."""
+        snapshot.vectors.flags.writeable = False
+        self._vector_buffer = snapshot.vectors
+        self._snapshot = snapshot
+
+    def _publish(self, sections: List[IndexedSection], vectors: np.ndarray) -> IndexSnapshot:
+        """Append sections with their vectors as a new generation.
+        
+        Vectors are appended to a buffer that doubles its capacity when full,
+        and every snapshot holds a read-only view of the buffer's first rows.
+        Rows already published are never written again, so older snapshots
+        stay valid, and an increment only copies its own vectors (plus the
+        amortized cost of growing).
+        """
+        current = self._snapshot
+        base = int(current.vectors.shape[0])
+        for i, s in enumerate(sections):
+            s.vector_offset = base + i
+        
+        end = base + len(vectors)
+        if end > self._vector_buffer.shape[0]:
+            capacity = max(end, 2 * self._vector_buffer.shape[0], INDEX_EMBED_BATCH)
+            buffer = np.empty((capacity, self.vector_dim), dtype=np.float32)
+            buffer[:base] = current.vectors
+            self._vector_buffer = buffer
+        self._vector_buffer[base:end] = vectors
+        merged = self._vector_buffer[:end]
+        merged.flags.writeable = False
+        self._snapshot = IndexSnapshot(current.generation + 1, current.sections + sections, merged)
+        return self._snapshot
+
     def _index_meta_path(self) -> str:
         return os.path.join(INDEX_DIR, "index.json")
 
@@ -309,21 +502,45 @@ class SemanticIndex:
             if os.path.exists(meta_path) and os.path.exists(vec_path):
                 with open(meta_path, "r", encoding="utf-8") as f:
                     data = json.load(f)
-                self.sections = [IndexedSection(**x) for x in data.get("sections", [])]
-                self.vectors = np.load(vec_path)
+                sections = [IndexedSection(**x) for x in data.get("sections", [])]
+                vectors = np.load(vec_path)
+                if vectors.shape[0] != len(sections):
+                    # Older indexes could hold extra vector rows; keep one row per section
+                    vectors = vectors[[s.vector_offset for s in sections]]
+                    for i, s in enumerate(sections):
+                        s.vector_offset = i
+                    print(f"🔧 Realigned {len(sections)} sections with their vectors")
+                self._set_snapshot(IndexSnapshot(1, sections, vectors))
                 print(f"✅ Loaded {len(self.sections)} sections from existing index")
             else:
                 print("ℹ️  No existing index found - starting fresh")
         except Exception as e:
             print(f"⚠️  Error loading index, starting fresh: {e}")
-            self.sections = []
-            self.vectors = np.empty((0, 384), dtype=np.float32)
+            self._set_snapshot(IndexSnapshot(0, [], np.empty((0, self.vector_dim), dtype=np.float32)))
+
+    def _load_frequencies(self) -> DocumentFrequencies:
+        """Corpus statistics for the loaded sections, rebuilt from them when missing or stale."""
+        frequencies = get_corpus_stats()
+        by_doc: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        for s in self.sections:
+            by_doc[s.doc_id].append((s.title, s.text))
+        if set(frequencies.doc_terms) != set(by_doc):
+            print(f"🔧 Rebuilding corpus statistics for {len(by_doc)} indexed documents")
+            frequencies = DocumentFrequencies()
+            for doc_id, sections in by_doc.items():
+                frequencies.add(doc_id, _document_terms(sections))
+            set_corpus_stats(frequencies)
+            if by_doc:
+                save_corpus_stats(frequencies)
+        return frequencies
 
     def _save(self) -> None:
-        tmp_meta = {"sections": [asdict(s) for s in self.sections]}
+        snap = self._snapshot
+        tmp_meta = {"sections": [asdict(s) for s in snap.sections]}
         with open(self._index_meta_path(), "w", encoding="utf-8") as f:
             json.dump(tmp_meta, f, ensure_ascii=False, indent=2)
-        np.save(self._index_vec_path(), self.vectors)
+        np.save(self._index_vec_path(), snap.vectors)
+        save_corpus_stats(self.frequencies)
 
     def _embed_texts(self, texts: List[str]) -> np.ndarray:
         if not texts:
@@ -344,105 +561,193 @@ class SemanticIndex:
         norms = np.linalg.norm(arr, axis=1, keepdims=True) + 1e-6
         return (arr / norms).astype(np.float32)
 
-    def ingest_documents(self, items: List[Tuple[str, str]]) -> Dict[str, Any]:
-        """Optimized document ingestion with batch processing"""
-        print(f"🔄 Starting optimized ingestion for {len(items)} items...")
+    def ingest_documents(self, items: List[Tuple[str, str]],
+                         on_publish: Optional[Callable[[IndexSnapshot, int], None]] = None) -> Dict[str, Any]:
+        """Extract, embed and index documents in page-ordered increments.
         
-        extractor = EnhancedSectionExtractor()
-        new_sections: List[IndexedSection] = []
-        new_vectors: List[str] = []
-        
-        # Process files in batches for better performance
-        batch_size = 3  # Process 3 files at a time
+        Every INDEX_PUBLISH_PAGES pages of a document (or INDEX_EMBED_BATCH
+        sections) are embedded and published as a new snapshot generation, so
+        queries see the first pages while the rest is still being processed.
+        on_publish is called with each new snapshot and its number of new sections.
+        """
+        print(f"🔄 Starting optimized ingestion for {len(items)} items...")
         
-        for batch_start in range(0, len(items), batch_size):
-            batch_end = min(batch_start + batch_size, len(items))
-            batch_items = items[batch_start:batch_end]
+        with self._ingest_lock:
+            ingested = 0
+            failed = []
+            present = [(doc_id, path) for doc_id, path in items if os.path.exists(path)]
             
-            print(f"🔄 Processing batch {batch_start//batch_size + 1}: {len(batch_items)} files")
-            
-            for doc_id, path in batch_items:
-                if not os.path.exists(path):
+            # Extraction fans out to worker processes; embedding and publishing
+            # stay here so the index keeps a single writer. Documents arrive in
+            # submission order so section ids are deterministic.
+            for doc_id, path, sections in iter_sections_parallel(present):
+                if self._retired:
+                    print("⚠️  Index was reset during ingestion, stopping")
+                    break
+                if sections is None:
+                    failed.append(doc_id)
                     continue
                 
                 filename = os.path.basename(path)
                 pdf_name = filename.replace(".pdf", "").replace("_", " ").title()
                 
-                # Extract sections with caching
-                sections = extractor.extract_sections(path)
-                
-                # Create sections more efficiently
-                for idx, (title, page, content) in enumerate(sections):
-                    # Simplified section creation
-                    section_id = f"{doc_id}_s{len(self.sections) + len(new_sections) + 1}"
-                    
-                    new_sections.append(
-                        IndexedSection(
-                            section_id=section_id,
-                            doc_id=doc_id,
-                            filename=filename,
-                            page=page,
-                            title=title,
-                            text=content,
-                            snippet=content[:300],  # Simplified snippet
-                            vector_offset=0,
-                            pdf_name=pdf_name,
-                            section_heading=title,
-                            section_content=content
+                pending: List[IndexedSection] = []
+                increment_start_page = None
+                # Fallback chunks are produced lazily, so they are embedded as
+                # they stream in and the document's terms are gathered on the way
+                terms: set = set()
+                try:
+                    for title, page, content in sections:
+                        if pending and (len(pending) >= INDEX_EMBED_BATCH
+                                        or page >= increment_start_page + INDEX_PUBLISH_PAGES):
+                            ingested += self._publish_increment(pending, on_publish)
+                            pending = []
+                        if not pending:
+                            increment_start_page = page
+                        
+                        # Simplified section creation
+                        section_id = f"{doc_id}_s{len(self.sections) + len(pending) + 1}"
+                        pending.append(
+                            IndexedSection(
+                                section_id=section_id,
+                                doc_id=doc_id,
+                                filename=filename,
+                                page=page,
+                                title=title,
+                                text=content,
+                                snippet=content[:300],  # Simplified snippet
+                                vector_offset=0,
+                                pdf_name=pdf_name,
+                                section_heading=title,
+                                section_content=content
+                            )
                         )
-                    )
-                    
-                    # Use title + first 200 chars for vectorization
-                    combined_text = f"{title}. {content[:200]}"
-                    new_vectors.append(combined_text)
-        
-        # Process embeddings in smaller batches for memory efficiency
-        if len(new_vectors) >= 10:
-            print(f"🔗 Processing embeddings for {len(new_vectors)} sections...")
-            vecs = self._embed_texts(new_vectors)
-            
-            # Assign offsets
-            base = int(self.vectors.shape[0])
-            for i, s in enumerate(new_sections[-len(vecs):]):
-                s.vector_offset = base + i
-            
-            # Append vectors
-            if vecs.size > 0:
-                if self.vectors.size == 0:
-                    self.vectors = vecs
-                else:
-                    self.vectors = np.vstack([self.vectors, vecs])
-        
-        # Final embedding batch for remaining sections
-        if new_vectors:
-            print(f"🔗 Final embedding batch for {len(new_vectors)} sections...")
-            vecs = self._embed_texts(new_vectors)
-            
-            base = int(self.vectors.shape[0])
-            for i, s in enumerate(new_sections[-len(vecs):]):
-                s.vector_offset = base + i
-            
-            if vecs.size > 0:
-                if self.vectors.size == 0:
-                    self.vectors = vecs
-                else:
-                    self.vectors = np.vstack([self.vectors, vecs])
-        
-        self.sections.extend(new_sections)
-        
-        # Save to disk
-        print("💾 Saving optimized index to disk...")
-        self._save()
-        
-        result = {"ingested": len(new_sections)}
-        print(f"✅ Optimized ingestion completed: {result}")
-        return result
+                        terms |= _document_terms([(title, content)])
+                except Exception as e:
+                    # Increments published so far stay searchable
+                    print(f"❌ EXTRACTION: Failed while streaming {filename}: {e}")
+                    failed.append(doc_id)
+                if pending:
+                    ingested += self._publish_increment(pending, on_publish)
+                if terms:
+                    # Re-ingesting a document replaces its statistics instead of counting it twice
+                    self.frequencies.add(doc_id, terms)
+            
+            if self._retired:
+                result = {"ingested": ingested, "aborted": True}
+            else:
+                # Save to disk
+                print("💾 Saving optimized index to disk...")
+                self._save()
+                result = {"ingested": ingested}
+            if failed:
+                result["failed"] = failed
+            print(f"✅ Optimized ingestion completed: {result} (generation {self.generation})")
+            return result
+
+    def _publish_increment(self, sections: List[IndexedSection],
+                           on_publish: Optional[Callable[[IndexSnapshot, int], None]]) -> int:
+        # Use title + first 200 chars for vectorization
+        vecs = self._embed_texts([f"{s.title}. {s.text[:200]}" for s in sections])
+        snap = self._publish(sections, vecs)
+        print(f"📢 Published generation {snap.generation}: {len(sections)} sections from "
+              f"{sections[0].filename} pages {sections[0].page}-{sections[-1].page}")
+        if on_publish is not None:
+            on_publish(snap, len(sections))
+        return len(sections)
+
+    def remove_documents(self, doc_ids: List[str]) -> int:
+        """Drop the documents' sections and corpus statistics; returns sections removed."""
+        wanted = set(doc_ids)
+        with self._ingest_lock:
+            had_stats = [doc_id for doc_id in wanted if self.frequencies.remove(doc_id)]
+            current = self._snapshot
+            keep = [i for i, s in enumerate(current.sections) if s.doc_id not in wanted]
+            removed = len(current.sections) - len(keep)
+            if removed:
+                # Published snapshots share section objects, so renumber copies
+                sections = [replace(current.sections[i], vector_offset=j) for j, i in enumerate(keep)]
+                self._set_snapshot(IndexSnapshot(current.generation + 1, sections, current.vectors[keep]))
+            if (removed or had_stats) and not self._retired:
+                self._save()
+        if removed:
+            print(f"🗑️  Removed {removed} sections of {len(wanted)} document(s) (generation {self.generation})")
+        return removed
+
+    def ingest_in_background(self, items: List[Tuple[str, str]], wait_seconds: float = 30.0) -> Dict[str, Any]:
+        """Run ingest_documents on a background thread.
+        
+        Returns once the first increment is searchable (or ingestion ends, or
+        wait_seconds pass) with the sections published so far.
+        """
+        first_published = threading.Event()
+        outcome: Dict[str, Any] = {}
+        # Sections published by this run only; other runs may publish meanwhile
+        published = [0]
+        
+        def count_published(_: IndexSnapshot, added: int) -> None:
+            published[0] += added
+            first_published.set()
+        
+        def run() -> None:
+            try:
+                outcome.update(self.ingest_documents(items, on_publish=count_published))
+            except Exception as e:
+                print(f"❌ Background ingestion failed: {e}")
+                outcome["error"] = str(e)
+            finally:
+                first_published.set()
+        
+        thread = threading.Thread(target=run, name="semantic-ingest", daemon=True)
+        thread.start()
+        first_published.wait(wait_seconds)
+        
+        if outcome:
+            return {**outcome, "status": "completed", "generation": self.generation}
+        return {
+            "ingested": published[0],
+            "status": "in_progress",
+            "generation": self.generation,
+        }
+
+    def doc_similarities(self, text: str, doc_ids: List[str]) -> Tuple[List[IndexedSection], np.ndarray, float]:
+        """Indexed sections of doc_ids, their similarity to text and text's baseline similarity.
+        
+        The text is embedded once and scored against the documents' rows in
+        one matrix product. Sections indexed more than once (re-ingested
+        documents) are returned once, in index order. The baseline is the
+        median similarity of text to the whole index (at most
+        SIMILARITY_BASELINE_SAMPLE rows), so it does not depend on which
+        documents are requested together.
+        """
+        snap = self._snapshot
+        wanted = set(doc_ids)
+        rows: List[int] = []
+        seen = set()
+        for i, s in enumerate(snap.sections):
+            if s.doc_id in wanted:
+                key = (s.doc_id, s.page, s.title, s.text)
+                if key not in seen:
+                    seen.add(key)
+                    rows.append(i)
+        if not rows or not text.strip():
+            return [snap.sections[i] for i in rows], np.zeros(len(rows), dtype=np.float32), 0.0
+        
+        q = self._embed_texts([text.strip()])[0]
+        sims = (snap.vectors[rows] @ q).astype(np.float32)
+        n = len(snap.sections)
+        sample = np.unique(np.linspace(0, n - 1, min(n, SIMILARITY_BASELINE_SAMPLE)).astype(np.int64))
+        baseline = float(np.median(snap.vectors[sample] @ q))
+        return [snap.sections[i] for i in rows], sims, baseline
 
     def query(self, text: str, k: int = 5) -> List[Dict[str, Any]]:
         print(f"🔍 Query started: '{text[:100]}...' (k={k})")
-        print(f"📊 Current index state: {len(self.sections)} sections, {self.vectors.shape[0]} vectors")
+        # One snapshot for the whole query; ingestion may publish meanwhile
+        snap = self._snapshot
+        print(f"📊 Current index state: {len(snap.sections)} sections, {snap.vectors.shape[0]} vectors "
+              f"(generation {snap.generation})")
         
-        if not text or self.vectors.size == 0:
+        if not text or snap.vectors.size == 0:
             print("❌ No text provided or no vectors in index")
             return []
         
@@ -454,13 +759,14 @@ class SemanticIndex:
         
         # Get semantic embeddings
         q = self._embed_texts([query_text])[0]
+        term_weights = self._keyword_weights(query_text)
         
         # Calculate semantic similarity
-        sims = (self.vectors @ q).astype(np.float32)
+        sims = (snap.vectors @ q).astype(np.float32)
         print(f"📈 Similarity scores range: {sims.min():.3f} to {sims.max():.3f}")
         
         # Get more candidates for better diversity and accuracy
-        candidates_k = min(k * 4, len(self.sections))
+        candidates_k = min(k * 4, len(snap.sections))
         idxs = np.argsort(-sims)[: max(1, candidates_k)]
         print(f"🎯 Top {len(idxs)} candidate scores: {[f'{sims[i]:.3f}' for i in idxs[:10]]}")
         
@@ -472,13 +778,13 @@ class SemanticIndex:
         print(f"🎚️  Using score threshold: {score_threshold}")
         
         for i in idxs:
-            if i < 0 or i >= len(self.sections):
+            if i < 0 or i >= len(snap.sections):
                 continue
             
             if len(results) >= k:
                 break
             
-            s = self.sections[i]
+            s = snap.sections[i]
             semantic_score = float(sims[i])
             
             print(f"🔍 Evaluating section: '{s.title[:30]}...' from {s.filename} (semantic: {semantic_score:.3f})")
@@ -487,7 +793,8 @@ class SemanticIndex:
             final_score = self._calculate_enhanced_score(
                 query_text=query_text,
                 section=s,
-                semantic_score=semantic_score
+                semantic_score=semantic_score,
+                term_weights=term_weights
             )
             
             print(f"   📊 Final score: {final_score:.3f} (threshold: {score_threshold})")
@@ -593,25 +900,39 @@ class SemanticIndex:
         content_preview = content[:300].strip().lower()
         return hashlib.md5(content_preview.encode()).hexdigest()[:16]
     
-    def _calculate_enhanced_score(self, query_text: str, section: IndexedSection, semantic_score: float) -> float:
+    def _keyword_weights(self, query_text: str) -> Dict[str, float]:
+        """Per query term match weight from corpus IDF.
+        
+        A term found in a single document weighs 1 and one found in every
+        document much less; terms without statistics keep weight 1.
+        """
+        terms = {term.strip(".,;:!?()\"'") for term in query_text.lower().split()}
+        idf = self.frequencies.idf(terms=terms)
+        rare = 1.0 + max(1, len(self.frequencies)) / 2.0  # IDF of a single-document term
+        return {term: min(1.0, weight / rare) for term, weight in idf.items()}
+    
+    def _calculate_enhanced_score(self, query_text: str, section: IndexedSection, semantic_score: float,
+                                  term_weights: Optional[Dict[str, float]] = None) -> float:
         """Calculate enhanced relevance score using multiple factors"""
         try:
             # Base semantic score
             score = semantic_score
+            term_weights = term_weights or {}
             
-            # 1. Keyword matching bonus (0.1 max)
+            # 1. Keyword matching bonus (0.1 max), IDF-weighted so common terms count less
             query_terms = set(query_text.lower().split())
             query_terms = {term for term in query_terms if len(term) > 2}
             
             content = getattr(section, 'section_content', section.text).lower()
             heading = getattr(section, 'section_heading', section.title).lower()
             
-            keyword_matches = 0
+            keyword_matches = 0.0
             for term in query_terms:
+                weight = term_weights.get(term.strip(".,;:!?()\"'"), 1.0)
                 if term in content:
-                    keyword_matches += 1
+                    keyword_matches += weight
                 if term in heading:
-                    keyword_matches += 2  # Heading matches are more important
+                    keyword_matches += 2 * weight  # Heading matches are more important
             
             keyword_bonus = min(0.1, keyword_matches * 0.02)
             score += keyword_bonus
@@ -704,10 +1025,22 @@ def get_index() -> SemanticIndex:
     return _GLOBAL_INDEX
 
 
+def get_loaded_index() -> Optional[SemanticIndex]:
+    """The global index if something already loaded it, without loading the model."""
+    return _GLOBAL_INDEX
+
+
 def reset_global_index():
-    """Reset the global index cache - used for refresh functionality"""
+    """Reset the global index cache - used for refresh functionality.
+
+    Only index data is dropped; the embedding model stays resident in the
+    process-wide registry.
+    """
     global _GLOBAL_INDEX
+    if _GLOBAL_INDEX is not None:
+        _GLOBAL_INDEX._retired = True
     _GLOBAL_INDEX = None
+    reset_corpus_stats()
 
 
 def clear_semantic_index_files():
@@ -747,19 +1080,20 @@ def clear_semantic_index_files():
                 print(error_msg)
                 errors.append(error_msg)
         
-        # Also clear embeddings cache directory if it exists
-        embeddings_cache_dir = os.path.join(INDEX_DIR, "embeddings_cache")
-        if os.path.exists(embeddings_cache_dir):
+        # Remove the corpus statistics kept alongside the index
+        if os.path.exists(CORPUS_STATS_PATH):
             try:
-                import shutil
-                shutil.rmtree(embeddings_cache_dir)
+                os.remove(CORPUS_STATS_PATH)
                 files_removed += 1
-                print(f"Removed embeddings cache: {embeddings_cache_dir}")
+                print(f"Removed corpus statistics: {CORPUS_STATS_PATH}")
             except Exception as e:
-                error_msg = f"Failed to remove embeddings cache: {e}"
+                error_msg = f"Failed to remove corpus_stats.json: {e}"
                 print(error_msg)
                 errors.append(error_msg)
         
+        # The embedding model cache lives outside INDEX_DIR (see
+        # services.embedding_registry) and is intentionally left untouched.
+        
         return {
             "index_files_removed": files_removed,
             "errors": errors if errors else None
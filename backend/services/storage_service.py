@@ -1,7 +1,9 @@
 import hashlib
 import os
 import shutil
-from typing import Literal, Optional
+import tempfile
+import time
+from typing import Literal, Optional, Tuple
 from pathlib import Path
 
 # Storage type definitions
@@ -24,6 +26,14 @@ for storage_type, directory in STORAGE_DIRS.items():
 # Also ensure base store directory exists for semantic index
 os.makedirs(STORE_BASE, exist_ok=True)
 
+# Uploads are streamed here first; on the store's filesystem so that moving a
+# finished upload into its storage directory is an atomic rename
+SPOOL_DIR = os.path.join(STORE_BASE, "spool")
+os.makedirs(SPOOL_DIR, exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1_048_576
+# Spool files older than this are leftovers from interrupted uploads
+SPOOL_MAX_AGE_SECONDS = 3600
+
 
 def _sha1(path: str) -> str:
     """Generate SHA1 hash for file"""
@@ -34,6 +44,60 @@ def _sha1(path: str) -> str:
     return h.hexdigest()[:16]
 
 
+def _safe_filename(original_filename: str) -> str:
+    # Clean the filename to be filesystem-safe
+    safe_filename = "".join(c for c in original_filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
+    return safe_filename.replace(' ', '_')
+
+
+def _find_stored(doc_id: str, storage_type: StorageType) -> Optional[str]:
+    """Path of a file already stored for doc_id in storage_type, if any"""
+    storage_dir = STORAGE_DIRS[storage_type]
+    for filename in os.listdir(storage_dir):
+        if filename.endswith(".pdf") and doc_id in filename:
+            return os.path.join(storage_dir, filename)
+    return None
+
+
+def _destination_path(doc_id: str, original_filename: str | None, storage_type: StorageType) -> str:
+    storage_dir = STORAGE_DIRS[storage_type]
+    
+    # Use original filename if provided, otherwise use hash
+    if original_filename:
+        safe_filename = _safe_filename(original_filename)
+        base_name = os.path.splitext(safe_filename)[0]
+        extension = os.path.splitext(safe_filename)[1]
+        
+        # Include storage type in filename for identification; the doc id
+        # makes the name unique, so an existing file holds the same content
+        return os.path.join(storage_dir, f"{storage_type}_{base_name}_{doc_id}{extension}")
+    return os.path.join(storage_dir, f"{storage_type}_{doc_id}.pdf")
+
+
+def _reuse_stored(doc_id: str, original_filename: str | None, storage_type: StorageType) -> Optional[str]:
+    """Path of already stored content doc_id under the requested filename.
+    
+    Content stored only under other filenames gets a hard link with the new
+    name, so a re-upload keeps its own filename without a second copy.
+    Returns None when the content is not stored yet (or cannot be linked).
+    """
+    existing = _find_stored(doc_id, storage_type)
+    if existing is None:
+        return None
+    if not original_filename:
+        return existing
+    dest = _destination_path(doc_id, original_filename, storage_type)
+    if os.path.exists(dest):
+        return dest
+    try:
+        os.link(existing, dest)
+    except FileExistsError:
+        pass  # a concurrent upload of the same file linked it first
+    except OSError:
+        return None
+    return dest
+
+
 def save_and_get_docid(
     temp_path: str, 
     original_filename: str | None = None, 
@@ -48,33 +112,72 @@ def save_and_get_docid(
         storage_type: Type of storage (bulk, fresh, or viewer)
     """
     doc_id = _sha1(temp_path)
-    storage_dir = STORAGE_DIRS[storage_type]
+    if _reuse_stored(doc_id, original_filename, storage_type) is None:
+        shutil.copyfile(temp_path, _destination_path(doc_id, original_filename, storage_type))
+    return doc_id
+
+
+async def save_upload_and_get_docid(
+    upload,
+    original_filename: str | None = None,
+    storage_type: StorageType = "fresh"
+) -> Tuple[str, str]:
+    """
+    Stream an upload into the store and return (doc_id, stored path).
     
-    # Use original filename if provided, otherwise use hash
-    if original_filename:
-        # Clean the filename to be filesystem-safe
-        safe_filename = "".join(c for c in original_filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
-        safe_filename = safe_filename.replace(' ', '_')
-        
-        # If filename already exists, append hash to make it unique
-        base_name = os.path.splitext(safe_filename)[0]
-        extension = os.path.splitext(safe_filename)[1]
+    The upload is read in chunks into a spool file while its sha1 is computed,
+    then renamed into the storage directory. Content already stored under the
+    same doc id is reused, under the upload's filename (see _reuse_stored).
+    The spool file never outlives the call.
+    
+    Args:
+        upload: Object with an async read(size) method (e.g. FastAPI UploadFile)
+        original_filename: Original filename
+        storage_type: Type of storage (bulk, fresh, or viewer)
+    """
+    h = hashlib.sha1()
+    fd, spool_path = tempfile.mkstemp(suffix=".part", dir=SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                h.update(chunk)
+                spool.write(chunk)
+        doc_id = h.hexdigest()[:16]
         
-        # Include storage type in filename for identification
-        dest = os.path.join(storage_dir, f"{storage_type}_{base_name}_{doc_id}{extension}")
+        stored = _reuse_stored(doc_id, original_filename, storage_type)
+        if stored is not None:
+            return doc_id, stored
         
-        # Ensure the filename is unique
-        counter = 1
-        while os.path.exists(dest):
-            dest = os.path.join(storage_dir, f"{storage_type}_{base_name}_{doc_id}_{counter}{extension}")
-            counter += 1
-    else:
-        dest = os.path.join(storage_dir, f"{storage_type}_{doc_id}.pdf")
-    
-    if not os.path.exists(dest):
-        shutil.copyfile(temp_path, dest)
-    
-    return doc_id
+        dest = _destination_path(doc_id, original_filename, storage_type)
+        try:
+            os.replace(spool_path, dest)
+        except OSError:
+            # Storage directory on another filesystem (custom *_STORE_DIR)
+            shutil.move(spool_path, dest)
+        return doc_id, dest
+    finally:
+        try:
+            os.remove(spool_path)
+        except OSError:
+            pass
+
+
+def cleanup_stale_spool_files(max_age_seconds: int = SPOOL_MAX_AGE_SECONDS) -> int:
+    """Remove spool files left behind by interrupted uploads; returns files removed"""
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    for name in os.listdir(SPOOL_DIR):
+        path = os.path.join(SPOOL_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
 
 
 def get_pdf_path(doc_id: str, storage_type: Optional[StorageType] = None) -> str:
@@ -87,10 +190,9 @@ def get_pdf_path(doc_id: str, storage_type: Optional[StorageType] = None) -> str
     """
     # If storage type is specified, search only in that directory
     if storage_type:
-        storage_dir = STORAGE_DIRS[storage_type]
-        for filename in os.listdir(storage_dir):
-            if filename.endswith(".pdf") and doc_id in filename:
-                return os.path.join(storage_dir, filename)
+        stored = _find_stored(doc_id, storage_type)
+        if stored is not None:
+            return stored
     else:
         # Search all storage directories
         for stype, storage_dir in STORAGE_DIRS.items():
@@ -174,9 +276,17 @@ def delete_file_by_docid(doc_id: str, storage_type: Optional[StorageType] = None
     if os.path.exists(file_path):
         try:
             os.remove(file_path)
-            return True
         except Exception:
-            pass
+            return False
+        # Re-uploads under other filenames are links to the same document
+        storage_dir = os.path.dirname(file_path)
+        for filename in os.listdir(storage_dir):
+            if filename.endswith(".pdf") and doc_id in filename:
+                try:
+                    os.remove(os.path.join(storage_dir, filename))
+                except OSError:
+                    pass
+        return True
     return False
 
 
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Small CSR sparse term-matrix engine used for persona relevance scoring.
+
+A ``Vocabulary`` is built once per request from the terms that can carry
+weight (IDF terms and query terms). ``TermMatrix.from_texts`` tokenizes a
+batch of texts into one rows x vocabulary count matrix in CSR form.
+Out-of-vocabulary tokens still count toward each row's length.
+
+``DocumentFrequencies`` holds corpus document frequencies that are updated a
+document at a time, so IDF weights never require re-reading the documents.
+"""
+import hashlib
+import re
+import threading
+from itertools import chain, repeat
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"[a-zA-Z]{3,}")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphabetic tokens of three or more letters"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class Vocabulary:
+    """Term -> column index mapping (insertion ordered)"""
+
+    def __init__(self, terms: Iterable[str] = ()) -> None:
+        self.index: Dict[str, int] = {}
+        for term in terms:
+            self.add(term)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def add(self, term: str) -> int:
+        idx = self.index.get(term)
+        if idx is None:
+            idx = self.index[term] = len(self.index)
+        return idx
+
+    def ids(self, tokens: Iterable[str]) -> np.ndarray:
+        """Column index per token, -1 for tokens outside the vocabulary"""
+        return np.array(list(map(self.index.get, tokens, repeat(-1))), dtype=np.int64)
+
+    def weights(self, values: Dict[str, float]) -> np.ndarray:
+        """Dense per-column vector from a {term: value} dict (0 for missing terms)"""
+        vector = np.zeros(len(self.index), dtype=np.float64)
+        for term, idx in self.index.items():
+            vector[idx] = values.get(term, 0.0)
+        return vector
+
+
+class TermMatrix:
+    """Term counts of a batch of texts as a CSR matrix (rows x vocabulary).
+
+    indptr/indices/data are the usual CSR arrays; row_lengths counts every
+    token of a row, including those outside the vocabulary.
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, n_terms: int,
+                 row_lengths: np.ndarray) -> None:
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.n_terms = n_terms
+        self.row_lengths = row_lengths
+        self._row_ids = np.repeat(np.arange(self.n_rows), np.diff(indptr))
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str], vocab: Vocabulary) -> "TermMatrix":
+        token_lists = [tokenize(text) for text in texts]
+        row_lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=len(token_lists))
+        token_ids = vocab.ids(chain.from_iterable(token_lists))
+        token_rows = np.repeat(np.arange(len(token_lists)), row_lengths)
+
+        # (row, column) pairs sort row-major, which is exactly CSR order
+        n_terms = max(1, len(vocab))
+        known = token_ids >= 0
+        cells, counts = np.unique(token_rows[known] * n_terms + token_ids[known], return_counts=True)
+        rows = cells // n_terms
+        indptr = np.searchsorted(rows, np.arange(len(token_lists) + 1))
+        return cls(indptr, cells % n_terms, counts.astype(np.float64), len(vocab), row_lengths)
+
+    def _row_sum(self, values: np.ndarray) -> np.ndarray:
+        return np.bincount(self._row_ids, weights=values, minlength=self.n_rows)
+
+    def scaled(self, row_factors: np.ndarray, column_factors: np.ndarray) -> "TermMatrix":
+        """Matrix with data[r, c] * row_factors[r] * column_factors[c] (same structure)"""
+        data = self.data * row_factors[self._row_ids] * column_factors[self.indices]
+        return TermMatrix(self.indptr, self.indices, data, self.n_terms, self.row_lengths)
+
+    def dot(self, vector: np.ndarray) -> np.ndarray:
+        """Sparse mat-vec: one value per row"""
+        return self._row_sum(self.data * vector[self.indices])
+
+    def row_norms(self) -> np.ndarray:
+        return np.sqrt(self._row_sum(self.data * self.data))
+
+    def count_present(self, column_mask: np.ndarray) -> np.ndarray:
+        """Number of distinct masked columns occurring in each row"""
+        return self._row_sum((self.data > 0) & column_mask[self.indices])
+
+
+class DocumentFrequencies:
+    """Number of documents containing each term, maintained incrementally.
+
+    Every document's distinct terms are kept so it can be removed or
+    replaced later. Safe to update while other threads compute IDF.
+    """
+
+    def __init__(self) -> None:
+        self.df: Dict[str, int] = {}
+        self.doc_terms: Dict[str, FrozenSet[str]] = {}
+        # XOR of per-document digests, so fingerprint() is independent of update order
+        self._doc_digests: Dict[str, int] = {}
+        self._digest = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self.doc_terms
+
+    def add(self, doc_id: str, terms: Iterable[str]) -> None:
+        """Count doc_id's distinct terms (replacing an earlier version of it)"""
+        terms = frozenset(terms)
+        with self._lock:
+            self._discard(doc_id)
+            self.doc_terms[doc_id] = terms
+            for term in terms:
+                self.df[term] = self.df.get(term, 0) + 1
+            digest = _document_digest(doc_id, terms)
+            self._doc_digests[doc_id] = digest
+            self._digest ^= digest
+
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            return self._discard(doc_id)
+
+    def _discard(self, doc_id: str) -> bool:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return False
+        self._digest ^= self._doc_digests.pop(doc_id)
+        for term in terms:
+            count = self.df[term] - 1
+            if count:
+                self.df[term] = count
+            else:
+                del self.df[term]
+        return True
+
+    def fingerprint(self) -> str:
+        """Identifies the current statistics: equal fingerprints give equal IDF weights"""
+        with self._lock:
+            return f"{len(self.doc_terms)}-{self._digest:016x}"
+
+    def idf(self, extra_docs: Optional[Mapping[str, Iterable[str]]] = None,
+            terms: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Smoothed IDF, 1 + N / (1 + df), of every term occurring in the corpus.
+
+        extra_docs ({doc_id: terms}) are counted as well unless the corpus
+        already holds them; terms restricts the result to those terms.
+        """
+        wanted = None if terms is None else set(terms)
+        with self._lock:
+            extra = [frozenset(t) for doc_id, t in (extra_docs or {}).items() if doc_id not in self.doc_terms]
+            n_docs = max(1, len(self.doc_terms) + len(extra))
+            if wanted is None:
+                df = dict(self.df)
+            else:
+                df = {t: self.df[t] for t in wanted if t in self.df}
+        for doc_terms in extra:
+            for term in doc_terms if wanted is None else doc_terms & wanted:
+                df[term] = df.get(term, 0) + 1
+        return {term: 1.0 + n_docs / (1 + count) for term, count in df.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact form: the term list once, each document as term indices"""
+        with self._lock:
+            terms = list(self.df)
+            index = {term: i for i, term in enumerate(terms)}
+            docs = {doc_id: sorted(index[t] for t in doc_terms) for doc_id, doc_terms in self.doc_terms.items()}
+        return {"terms": terms, "docs": docs}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocumentFrequencies":
+        frequencies = cls()
+        terms = data.get("terms", [])
+        for doc_id, ids in data.get("docs", {}).items():
+            frequencies.add(doc_id, (terms[i] for i in ids))
+        return frequencies
+
+
+def _document_digest(doc_id: str, terms: FrozenSet[str]) -> int:
+    payload = "\0".join([doc_id, *sorted(terms)]).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "big")
+
+
+def safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator with 0 wherever the denominator is 0"""
+    out = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
@@ -70,7 +70,8 @@ def setup_directories():
         store_dir / "bulk_uploads",
         store_dir / "fresh_uploads", 
         store_dir / "viewer_uploads",
-        store_dir / "semantic_index"
+        store_dir / "semantic_index",
+        Path(os.environ.get("EMBEDDING_CACHE_DIR", store_dir / "embedding_models"))
     ]
     
     for dir_path in directories:
@@ -219,7 +219,8 @@ export default function ReaderPage() {
       
       // Now upload fresh
       console.log("📤 NUCLEAR: Starting fresh upload...");
-      await searchIngest({ files: [file], storage_type: "fresh" });
+      // Returns once the first pages are searchable; the rest is indexed in the background
+      await searchIngest({ files: [file], storage_type: "fresh", background: true });
       setFreshUploadStatus("processing");
       
       // Extract to get proper docId and set as current document
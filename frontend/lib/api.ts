@@ -18,6 +18,7 @@ export async function extractOutline(params: {
     docId: string;
     title: string;
     outline: { level: string; text: string; page: number }[];
+    source?: "embedded_toc" | "layout";
   }>;
 }
 
@@ -26,17 +27,74 @@ export async function personaAnalyze(payload: {
   jobToBeDone: string;
   files?: File[];
   docIds?: string[];
+  // "auto" (default) scores ingested docIds from the search index
+  mode?: "auto" | "index" | "parse";
 }) {
   const fd = new FormData();
   fd.append("persona", payload.persona);
   fd.append("jobToBeDone", payload.jobToBeDone);
   payload.files?.forEach((f) => fd.append("files", f));
   payload.docIds?.forEach((id) => fd.append("docIds", id));
+  if (payload.mode) fd.append("mode", payload.mode);
   const res = await fetch(`${API}/v1/persona/analyze`, { method: "POST", body: fd });
   if (!res.ok) throw new Error(await res.text());
   return res.json();
 }
 
+export type PersonaSection = {
+  document: string;
+  section_title: string;
+  importance_rank: number;
+  page_number: number;
+};
+
+export type PersonaStreamEvent =
+  | { event: "start"; total: number; documents: string[] }
+  | {
+      event: "document";
+      document: string;
+      completed: number;
+      total: number;
+      failed: boolean;
+      // Provisional top sections over the documents finished so far
+      extracted_sections: PersonaSection[];
+    }
+  | { event: "result"; cached?: boolean; result: any };
+
+// Streams progress (NDJSON) and resolves with the final result
+export async function personaAnalyzeStream(
+  payload: { persona: string; jobToBeDone: string; files?: File[]; docIds?: string[] },
+  onEvent: (event: PersonaStreamEvent) => void
+) {
+  const fd = new FormData();
+  fd.append("persona", payload.persona);
+  fd.append("jobToBeDone", payload.jobToBeDone);
+  payload.files?.forEach((f) => fd.append("files", f));
+  payload.docIds?.forEach((id) => fd.append("docIds", id));
+  const res = await fetch(`${API}/v1/persona/analyze/stream`, { method: "POST", body: fd });
+  if (!res.ok || !res.body) throw new Error(await res.text());
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  let result: any = null;
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffered += decoder.decode(value, { stream: !done });
+    const lines = buffered.split("\n");
+    buffered = done ? "" : lines.pop() ?? "";
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      const event = JSON.parse(line) as PersonaStreamEvent;
+      if (event.event === "result") result = event.result;
+      onEvent(event);
+    }
+    if (done) break;
+  }
+  if (!result) throw new Error("Persona stream ended without a result");
+  return result;
+}
+
 export const docUrl = (docId: string) => `${API}/v1/files/${docId}`;
 
 
@@ -64,11 +122,13 @@ export async function searchIngest(payload: {
   files?: File[]; 
   docIds?: string[];
   storage_type?: "bulk" | "fresh" | "viewer";
+  background?: boolean;
 }) {
   const fd = new FormData();
   payload.files?.forEach((f) => fd.append("files", f));
   payload.docIds?.forEach((id) => fd.append("docIds", id));
   if (payload.storage_type) fd.append("storage_type", payload.storage_type);
+  if (payload.background) fd.append("background", "true");
   const res = await fetch(`${API}/v1/search/ingest`, { method: "POST", body: fd });
   if (!res.ok) throw new Error(await res.text());
   return res.json() as Promise<{ ingested: number }>;